@@ -4,12 +4,20 @@ Ansible Community Module Manager
 Discovers and installs community modules and collections
 """
 
+import functools
 import os
 import subprocess
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Where ansible-galaxy installs collections by default
+_COLLECTIONS_ROOT = Path(os.path.expanduser('~/.ansible/collections/ansible_collections'))
+
+# Collections looked up and found missing; cleared whenever an install succeeds
+_MISS_CACHE = set()
+
 def search_community_modules(search_term, dry_run=False, verbose=False):
     """Search for community modules"""
     if dry_run:
@@ -18,21 +26,25 @@ def search_community_modules(search_term, dry_run=False, verbose=False):
         return True
     
     try:
-        result = subprocess.run(
+        # Let results stream straight to the terminal; only stderr is kept for errors
+        print("Search results:", flush=True)
+        subprocess.run(
             ['ansible-galaxy', 'search', search_term],
-            capture_output=True,
+            stderr=subprocess.PIPE,
             text=True,
             check=True
         )
-        print("Search results:")
-        print(result.stdout)
         return True
     except subprocess.CalledProcessError as e:
         print(f"Search failed: {e.stderr}")
         return False
 
-def install_collection(collection_name, dry_run=False, verbose=False):
-    """Install Ansible collection"""
+def install_collection(collection_name, dry_run=False, verbose=False, stream=False):
+    """Install Ansible collection
+    
+    ansible-galaxy output is discarded unless stream=True, which sends its
+    progress straight to the terminal as it arrives.
+    """
     if dry_run:
         print(f"[DRY RUN] Would install collection: {collection_name}")
         
@@ -46,12 +58,15 @@ def install_collection(collection_name, dry_run=False, verbose=False):
         return True
     
     try:
-        result = subprocess.run(
+        sys.stdout.flush()
+        subprocess.run(
             ['ansible-galaxy', 'collection', 'install', collection_name],
-            capture_output=True,
+            stdout=None if stream else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
             text=True,
             check=True
         )
+        _MISS_CACHE.clear()
         print(f"✓ Installed collection: {collection_name}")
         return True
     except subprocess.CalledProcessError as e:
@@ -60,40 +75,57 @@ def install_collection(collection_name, dry_run=False, verbose=False):
 
 def list_installed_collections():
     """List installed collections"""
-    collections_path = Path.home() / '.ansible' / 'collections' / 'ansible_collections'
+    collections_path = _COLLECTIONS_ROOT
     
     if not collections_path.exists():
         print("No collections installed")
         return
     
-    print("Installed collections:")
-    for namespace in collections_path.iterdir():
-        if namespace.is_dir():
-            for collection in namespace.iterdir():
-                if collection.is_dir():
-                    print(f"  {namespace.name}.{collection.name}")
+    # scandir reuses each dirent's type, avoiding a stat() per entry
+    lines = ["Installed collections:"]
+    with os.scandir(collections_path) as namespaces:
+        for namespace in namespaces:
+            if namespace.is_dir():
+                with os.scandir(namespace.path) as collections:
+                    for collection in collections:
+                        if collection.is_dir():
+                            lines.append(f"  {namespace.name}.{collection.name}")
+    sys.stdout.write("\n".join(lines) + "\n")
+
+@functools.lru_cache(maxsize=128)
+def _read_meta(path, mtime_ns, size):
+    """Read a collection metadata file; mtime and size key the cache so edits are picked up"""
+    with open(path) as f:
+        return f.read()
 
 def get_collection_info(collection_name):
     """Get information about a collection"""
+    if collection_name in _MISS_CACHE:
+        print(f"Collection {collection_name} not found")
+        return
+    
     try:
         namespace, name = collection_name.split('.')
-        collection_path = Path.home() / '.ansible' / 'collections' / 'ansible_collections' / namespace / name
+        collection_path = _COLLECTIONS_ROOT / namespace / name
         
         if collection_path.exists():
             meta_file = collection_path / 'meta' / 'runtime.yml'
-            if meta_file.exists():
-                with open(meta_file) as f:
-                    print(f"Collection info for {collection_name}:")
-                    print(f.read())
-            else:
+            try:
+                stat = os.stat(meta_file)
+            except FileNotFoundError:
                 print(f"Collection {collection_name} is installed but no metadata found")
+            else:
+                content = _read_meta(str(meta_file), stat.st_mtime_ns, stat.st_size)
+                print(f"Collection info for {collection_name}:")
+                print(content)
         else:
+            _MISS_CACHE.add(collection_name)
             print(f"Collection {collection_name} not found")
     except ValueError:
         print("Collection name must be in format 'namespace.name'")
 
-def install_common_collections(dry_run=False):
-    """Install commonly used collections"""
+def install_common_collections(dry_run=False, stream=False):
+    """Install commonly used collections, showing ansible-galaxy progress if stream=True"""
     common_collections = [
         'community.general',
         'community.crypto',
@@ -102,9 +134,37 @@ def install_common_collections(dry_run=False):
         'community.windows'
     ]
     
+    command = ['ansible-galaxy', 'collection', 'install', *common_collections]
+    
+    if dry_run:
+        print(f"[DRY RUN] Would install collections: {', '.join(common_collections)}")
+        print(f"  Command: {' '.join(command)}")
+        return True
+    
     print("Installing common collections...")
-    for collection in common_collections:
-        install_collection(collection, dry_run)
+    # One ansible-galaxy run resolves every collection with a single startup
+    try:
+        sys.stdout.flush()
+        subprocess.run(
+            command,
+            stdout=None if stream else subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True,
+            check=True
+        )
+        _MISS_CACHE.clear()
+        for collection in common_collections:
+            print(f"✓ Installed collection: {collection}")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"Batch install failed, retrying collections individually: {e.stderr}")
+    
+    # Retries mostly wait on Galaxy, so run a few at once; capped to stay clear of rate limits.
+    # Their output is never streamed, as concurrent installs would interleave it
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(install_collection, common_collections))
+    
+    return all(results)
 
 if __name__ == "__main__":
     import argparse
@@ -114,6 +174,7 @@ if __name__ == "__main__":
     parser.add_argument('term', nargs='?', help='Search term or collection name')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be done')
     parser.add_argument('--verbose', action='store_true', help='Show detailed planning information')
+    parser.add_argument('--stream', action='store_true', help='Show ansible-galaxy install progress as it runs')
     
     args = parser.parse_args()
     
@@ -121,12 +182,12 @@ if __name__ == "__main__":
     if args.action == "search" and args.term:
         success = search_community_modules(args.term, args.dry_run)
     elif args.action == "install" and args.term:
-        success = install_collection(args.term, args.dry_run, args.verbose)
+        success = install_collection(args.term, args.dry_run, args.verbose, args.stream)
     elif args.action == "list":
         success = list_installed_collections()
     elif args.action == "info" and args.term:
         success = get_collection_info(args.term)
     elif args.action == "install_common":
-        success = install_common_collections(args.dry_run)
+        success = install_common_collections(args.dry_run, args.stream)
     
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -4,38 +4,110 @@ Context Preservation Module
 Maintains Ansible best practices and prevents context attrition
 """
 
+import functools
 import json
 import os
+import re
 import time
-from datetime import datetime, timedelta
+from collections import deque
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional
 
+# Prefer orjson for context (de)serialization, falling back to stdlib json.
+# Files are machine-read, so both paths write compact JSON.
+try:
+    import orjson
+
+    def _dumps(data: Any) -> bytes:
+        return orjson.dumps(data)
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(data: Any) -> bytes:
+        return json.dumps(data, separators=(',', ':')).encode()
+
+    _loads = json.loads
+
+# Freshness windows, in seconds, for the saved context and session files
+CONTEXT_MAX_AGE = 24 * 60 * 60
+SESSION_MAX_AGE = 2 * 60 * 60
+
+# Minimum seconds between rewrites of an unchanged session file
+SESSION_WRITE_INTERVAL = 60
+
+# Number of operations kept in the context history
+MAX_RECENT_OPERATIONS = 20
+
+_iso_second = None
+_iso_text = ""
+
+def _now_iso() -> str:
+    """Current local time as an ISO string, reformatted at most once per second"""
+    global _iso_second, _iso_text
+    now = int(time.time())
+    if now != _iso_second:
+        _iso_second = now
+        _iso_text = datetime.fromtimestamp(now).isoformat()
+    return _iso_text
+
+# Anti-patterns spotted in recent operation details and the reminder each triggers
+_ANTI_PATTERN_RE = re.compile(r"(?=(shell|ssh|systemctl))")
+_ANTI_PATTERN_REMINDERS = {
+    "shell": "📋 Consider using specific Ansible modules instead of shell commands",
+    "ssh": "📋 Use Ansible inventory instead of direct SSH",
+    "systemctl": "📋 Use systemd or service modules for service management"
+}
+
+# Reminders shown regardless of recent operations
+_GENERAL_REMINDERS = (
+    "🔍 Always use --check --diff before applying changes",
+    "📋 Use proper module names instead of generic shell commands",
+    "🏷️  Tag tasks for better organization and selective execution",
+    "📊 Use ansible_facts for dynamic configuration"
+)
+
 class ContextPreserver:
     """Preserves and maintains Ansible context across sessions"""
     
     def __init__(self, context_dir: str = "/tmp/ansible_context"):
         self.context_dir = Path(context_dir)
-        self.context_dir.mkdir(exist_ok=True)
+        try:
+            os.stat(self.context_dir)
+        except FileNotFoundError:
+            self.context_dir.mkdir(parents=True, exist_ok=True)
         self.context_file = self.context_dir / "ansible_context.json"
         self.session_file = self.context_dir / "current_session.json"
+        # Parsed context file, reused while its (mtime_ns, size) is unchanged
+        self._context_cache = None
+        self._context_key = None
+        # Session ID resolved once per process instead of on every save
+        self._session_id = None
+        # Last session payload written and when, used to throttle rewrites
+        self._session_written = None
+        self._session_written_at = 0.0
         
     def save_context(self, context_data: Dict[str, Any]) -> bool:
         """Save current Ansible context"""
         try:
             context = {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": _now_iso(),
+                "epoch": int(time.time()),
                 "session_id": self._get_session_id(),
                 "ansible_patterns": context_data.get("ansible_patterns", []),
                 "best_practices": context_data.get("best_practices", []),
                 "common_modules": context_data.get("common_modules", []),
                 "anti_patterns": context_data.get("anti_patterns", []),
                 "inventory_structure": context_data.get("inventory_structure", {}),
-                "recent_operations": context_data.get("recent_operations", [])
+                # The cache keeps its own bounded history; JSON gets a list
+                "recent_operations": deque(context_data.get("recent_operations", []),
+                                           maxlen=MAX_RECENT_OPERATIONS)
             }
             
-            with open(self.context_file, 'w') as f:
-                json.dump(context, f, indent=2)
+            self._write_atomic(self.context_file,
+                               _dumps({**context, "recent_operations": list(context["recent_operations"])}))
+            # Cached only once the file holds it
+            self._remember_context(context)
             
             # Update current session
             self._update_session(context_data)
@@ -47,19 +119,61 @@ class ContextPreserver:
     def load_context(self) -> Dict[str, Any]:
         """Load preserved Ansible context"""
         try:
-            if self.context_file.exists():
-                with open(self.context_file) as f:
-                    context = json.load(f)
-                
-                # Check if context is recent (within 24 hours)
-                timestamp = datetime.fromisoformat(context["timestamp"])
-                if datetime.now() - timestamp < timedelta(hours=24):
-                    return context
+            stat = os.stat(self.context_file)
+        except FileNotFoundError:
+            return self._get_default_context()
+        
+        try:
+            if (stat.st_mtime_ns, stat.st_size) == self._context_key:
+                context = self._context_cache
+            else:
+                with open(self.context_file, 'rb') as f:
+                    context = _loads(f.read())
+                context["recent_operations"] = deque(context.get("recent_operations", []),
+                                                     maxlen=MAX_RECENT_OPERATIONS)
+                self._remember_context(context, stat)
+            
+            # Check if context is recent (within 24 hours)
+            if time.time() - self._epoch_of(context) < CONTEXT_MAX_AGE:
+                # Callers get their own copy, so changes never leak into the cache
+                return {**context, "recent_operations": deque(context["recent_operations"],
+                                                              maxlen=MAX_RECENT_OPERATIONS)}
         except Exception as e:
             print(f"Failed to load context: {e}")
         
         return self._get_default_context()
     
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        """Write data to a temp file with one write() and rename it over path"""
+        # Per-process temp name: concurrent writers never share a half-written file
+        tmp_path = path.with_suffix(f"{path.suffix}.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+            finally:
+                os.close(fd)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+    
+    def _remember_context(self, context: Dict[str, Any], stat: Optional[os.stat_result] = None) -> None:
+        """Cache parsed context against the context file's current mtime and size"""
+        if stat is None:
+            stat = os.stat(self.context_file)
+        self._context_cache = context
+        self._context_key = (stat.st_mtime_ns, stat.st_size)
+    
+    @staticmethod
+    def _epoch_of(record: Dict[str, Any]) -> float:
+        """Epoch seconds of a saved record, parsing the ISO timestamp only for older files"""
+        if "epoch" in record:
+            return record["epoch"]
+        return datetime.fromisoformat(record["timestamp"]).timestamp()
+    
     def add_operation(self, operation_type: str, details: Dict[str, Any]) -> None:
         """Add operation to context history"""
         context = self.load_context()
@@ -67,53 +181,42 @@ class ContextPreserver:
         operation = {
             "type": operation_type,
             "details": details,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso()
         }
         
+        # Bounded history: appending past the limit drops the oldest entry
         context["recent_operations"].append(operation)
         
-        # Keep only last 20 operations
-        context["recent_operations"] = context["recent_operations"][-20:]
-        
         self.save_context(context)
     
     def get_ansible_reminders(self) -> List[str]:
         """Get reminders about Ansible best practices"""
         context = self.load_context()
-        reminders = []
+        reminders = {}  # insertion-ordered set
         
         # Check for common anti-patterns in recent operations
         recent_ops = context.get("recent_operations", [])
-        for op in recent_ops[-5:]:  # Last 5 operations
-            if "shell" in str(op.get("details", {})).lower():
-                reminders.append("📋 Consider using specific Ansible modules instead of shell commands")
-            
-            if "ssh" in str(op.get("details", {})).lower():
-                reminders.append("📋 Use Ansible inventory instead of direct SSH")
-            
-            if "systemctl" in str(op.get("details", {})).lower():
-                reminders.append("📋 Use systemd or service modules for service management")
+        for op in list(recent_ops)[-5:]:  # Last 5 operations
+            blob = json.dumps(op.get("details", {}), default=str).lower()
+            for m in _ANTI_PATTERN_RE.finditer(blob):
+                reminders[_ANTI_PATTERN_REMINDERS[m.group(1)]] = None
         
         # Add general reminders
-        reminders.extend([
-            "🔍 Always use --check --diff before applying changes",
-            "📋 Use proper module names instead of generic shell commands",
-            "🏷️  Tag tasks for better organization and selective execution",
-            "📊 Use ansible_facts for dynamic configuration"
-        ])
-        
-        return list(set(reminders))  # Remove duplicates
+        return list(dict.fromkeys([*reminders, *_GENERAL_REMINDERS]))
     
     def _get_session_id(self) -> str:
         """Generate or retrieve session ID"""
+        if self._session_id is not None:
+            return self._session_id
+        
         if self.session_file.exists():
             try:
-                with open(self.session_file) as f:
-                    session = json.load(f)
+                with open(self.session_file, 'rb') as f:
+                    session = _loads(f.read())
                     # Check if session is recent (within 2 hours)
-                    timestamp = datetime.fromisoformat(session["timestamp"])
-                    if datetime.now() - timestamp < timedelta(hours=2):
-                        return session["id"]
+                    if time.time() - self._epoch_of(session) < SESSION_MAX_AGE:
+                        self._session_id = session["id"]
+                        return self._session_id
             except:
                 pass
         
@@ -121,30 +224,44 @@ class ContextPreserver:
         session_id = f"ansible_session_{int(time.time())}"
         session_data = {
             "id": session_id,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": _now_iso(),
+            "epoch": int(time.time())
         }
         
-        with open(self.session_file, 'w') as f:
-            json.dump(session_data, f, indent=2)
+        self._write_atomic(self.session_file, _dumps(session_data))
         
+        self._session_id = session_id
         return session_id
     
     def _update_session(self, context_data: Dict[str, Any]) -> None:
         """Update current session with context data"""
+        payload = (
+            self._get_session_id(),
+            context_data.get("last_operation"),
+            context_data.get("ansible_patterns", [])
+        )
+        now = time.time()
+        # Unchanged payload written recently: the file on disk is still current
+        if payload == self._session_written and now - self._session_written_at < SESSION_WRITE_INTERVAL:
+            return
+        
         session_data = {
-            "id": self._get_session_id(),
-            "timestamp": datetime.now().isoformat(),
-            "last_operation": context_data.get("last_operation"),
-            "ansible_patterns_used": context_data.get("ansible_patterns", [])
+            "id": payload[0],
+            "timestamp": _now_iso(),
+            "epoch": int(now),
+            "last_operation": payload[1],
+            "ansible_patterns_used": payload[2]
         }
         
-        with open(self.session_file, 'w') as f:
-            json.dump(session_data, f, indent=2)
+        self._write_atomic(self.session_file, _dumps(session_data))
+        self._session_written = payload
+        self._session_written_at = now
     
     def _get_default_context(self) -> Dict[str, Any]:
         """Get default Ansible context"""
         return {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": _now_iso(),
+            "epoch": int(time.time()),
             "session_id": self._get_session_id(),
             "ansible_patterns": [
                 "Use --check --diff for safe previews",
@@ -171,18 +288,13 @@ class ContextPreserver:
                 "Missing inventory consideration"
             ],
             "inventory_structure": {},
-            "recent_operations": []
+            "recent_operations": deque(maxlen=MAX_RECENT_OPERATIONS)
         }
 
-# Global context preserver instance
-_context_preserver = None
-
+@functools.lru_cache(maxsize=1)
 def get_context_preserver() -> ContextPreserver:
     """Get global context preserver instance"""
-    global _context_preserver
-    if _context_preserver is None:
-        _context_preserver = ContextPreserver()
-    return _context_preserver
+    return ContextPreserver()
 
 def preserve_ansible_context(operation_type: str, details: Dict[str, Any]) -> None:
     """Quick function to preserve Ansible context"""
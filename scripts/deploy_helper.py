@@ -4,9 +4,15 @@ Ansible Deploy Helper
 Progressive deployment with staging and recovery capabilities
 """
 
+import atexit
 import os
 import sys
 import json
+import functools
+import re
+import shlex
+import shutil
+import socket
 import time
 import subprocess
 import yaml
@@ -14,9 +20,30 @@ import asyncio
 import threading
 import psutil
 import platform
+from collections import Counter
 from pathlib import Path
 from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor
+
+# Use the libyaml-backed loader when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _Loader
+except ImportError:
+    from yaml import SafeLoader as _Loader
+
+# Prefer orjson for the state snapshot, which emits bytes directly
+try:
+    import orjson
+    
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode()
+    
+    _loads = json.loads
 
 # Import guardrails for context preservation
 GUARDRAILS_AVAILABLE = False
@@ -30,29 +57,100 @@ try:
 except ImportError:
     pass
 
+# (epoch second, ISO string) of the last formatted timestamp, swapped as one
+# tuple so threads deploying stages in parallel never see a torn pair
+_iso_cache = (None, "")
+
+def _now_iso():
+    """Current local time as an ISO string, reformatted at most once per second"""
+    global _iso_cache
+    now = int(time.time())
+    if now != _iso_cache[0]:
+        _iso_cache = (now, datetime.fromtimestamp(now).isoformat())
+    return _iso_cache[1]
+
+# Stage transitions are appended to a JSONL log next to the state file and
+# folded into a full snapshot every SNAPSHOT_INTERVAL events or on completion
+SNAPSHOT_INTERVAL = 10
+_EVENTS_SINCE_SNAPSHOT = Counter()
+
+# Serializes state updates from stages deployed in parallel
+_STATE_LOCK = threading.Lock()
+
+def _event_log_path(state_file):
+    """Path of the stage event log that accompanies state_file"""
+    return str(Path(state_file).with_suffix('.jsonl'))
+
+def _apply_stage_event(state, event):
+    """Fold one stage event into the in-memory state"""
+    fields = {k: v for k, v in event.items() if k not in ('ts', 'stage')}
+    state.setdefault('stages', {}).setdefault(event['stage'], {}).update(fields)
+    state['last_updated'] = event['ts']
+
+def append_stage_event(stage_name, status, state_file="deployment_state.json", **details):
+    """Append a stage transition to the event log and return the recorded event"""
+    event = {'ts': _now_iso(), 'stage': stage_name, 'status': status, **details}
+    log_file = _event_log_path(state_file)
+    with open(log_file, 'a') as f:
+        f.write(json.dumps(event) + '\n')
+    _EVENTS_SINCE_SNAPSHOT[log_file] += 1
+    return event
+
+def record_stage_event(state, stage_name, status, state_file="deployment_state.json", **details):
+    """Log a stage transition, apply it to state and snapshot when the log grows long"""
+    with _STATE_LOCK:
+        _apply_stage_event(state, append_stage_event(stage_name, status, state_file, **details))
+        if _EVENTS_SINCE_SNAPSHOT[_event_log_path(state_file)] >= SNAPSHOT_INTERVAL:
+            save_deployment_state(state, state_file)
+
 def load_deployment_state(state_file="deployment_state.json"):
     """Load previous deployment state"""
     try:
-        if Path(state_file).exists():
-            with open(state_file) as f:
-                return json.load(f)
-        return {}
-    except (json.JSONDecodeError, FileNotFoundError):
-        return {}
+        state = _loads(Path(state_file).read_bytes())
+    except (ValueError, FileNotFoundError):
+        state = {}
+    
+    # Replay stage events recorded since the last snapshot
+    log_file = _event_log_path(state_file)
+    replayed = 0
+    try:
+        with open(log_file) as f:
+            for line in f:
+                try:
+                    _apply_stage_event(state, json.loads(line))
+                    replayed += 1
+                except (json.JSONDecodeError, KeyError):
+                    # A torn last line from an interrupted append
+                    continue
+    except FileNotFoundError:
+        pass
+    _EVENTS_SINCE_SNAPSHOT[log_file] = replayed
+    return state
 
 def save_deployment_state(state, state_file="deployment_state.json"):
     """Save deployment state for recovery"""
     try:
         # Add timestamp to state
-        state['last_updated'] = datetime.now().isoformat()
+        state['last_updated'] = _now_iso()
+        
+        # Write then swap so an interrupted save never leaves a torn state file
+        tmp_file = f"{state_file}.tmp"
+        Path(tmp_file).write_bytes(_dumps(state))
         
         # Create backup of previous state
-        if Path(state_file).exists():
-            backup_file = f"{state_file}.backup"
-            Path(state_file).rename(backup_file)
+        try:
+            os.replace(state_file, f"{state_file}.backup")
+        except FileNotFoundError:
+            pass
+        os.replace(tmp_file, state_file)
         
-        with open(state_file, 'w') as f:
-                json.dump(state, f, indent=2)
+        # The snapshot now holds every logged event
+        log_file = _event_log_path(state_file)
+        try:
+            os.remove(log_file)
+        except FileNotFoundError:
+            pass
+        _EVENTS_SINCE_SNAPSHOT[log_file] = 0
         return True
     except Exception as e:
         print(f"Warning: Could not save state: {e}")
@@ -70,9 +168,10 @@ def get_deployment_status(state_file="deployment_state.json"):
         }
     
     stages = state.get('stages', {})
-    completed = sum(1 for s in stages.values() if s.get('status') == 'completed')
-    failed = sum(1 for s in stages.values() if s.get('status') == 'failed')
-    in_progress = sum(1 for s in stages.values() if s.get('status') == 'in_progress')
+    counts = Counter(s.get('status') for s in stages.values())
+    completed = counts['completed']
+    failed = counts['failed']
+    in_progress = counts['in_progress']
     total = len(stages)
     
     if completed == total and total > 0:
@@ -100,17 +199,73 @@ def get_deployment_status(state_file="deployment_state.json"):
 def reset_deployment_state(state_file="deployment_state.json"):
     """Reset deployment state"""
     try:
-        if Path(state_file).exists():
-            backup_file = f"{state_file}.reset_backup"
-            Path(state_file).rename(backup_file)
+        backup_file = f"{state_file}.reset_backup"
+        try:
+            os.replace(state_file, backup_file)
             print(f"📦 State backed up to: {backup_file}")
+        except FileNotFoundError:
+            pass
+        log_file = _event_log_path(state_file)
+        try:
+            os.replace(log_file, f"{log_file}.reset_backup")
+        except FileNotFoundError:
+            pass
+        _EVENTS_SINCE_SNAPSHOT[log_file] = 0
         return True
     except Exception as e:
         print(f"❌ Could not reset state: {e}")
         return False
 
+# Hardware profile snapshot reused across runs until the host reboots
+HWPROFILE_CACHE = Path("~/.cache/ansible-deploy/hwprofile.json").expanduser()
+
+def _hardware_cache_key():
+    """Identify this host and boot so a cached profile is dropped after reboot or migration"""
+    return [platform.node(), psutil.boot_time(), platform.python_version()]
+
+def _load_cached_profile(path=HWPROFILE_CACHE):
+    """Return the cached hardware profile if it was taken on this host since its last boot"""
+    try:
+        with open(path) as f:
+            cached = json.load(f)
+        if cached.get('key') == _hardware_cache_key():
+            return cached['profile']
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+def _save_cached_profile(profile, path=HWPROFILE_CACHE):
+    """Atomically persist the hardware profile; failures only cost a re-probe next run"""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({'key': _hardware_cache_key(), 'profile': profile}, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+# Profile types optimize_for_hardware knows; ANSIBLE_DEPLOY_PROFILE may name
+# one of them to skip hardware probing entirely (CI, containers)
+PROFILE_TYPES = ('high_performance', 'standard', 'minimal', 'resource_constrained')
+PROFILE_ENV_VAR = 'ANSIBLE_DEPLOY_PROFILE'
+
+@functools.lru_cache(maxsize=1)
 def detect_hardware_profile():
     """Detect hardware profile for optimization"""
+    override = os.environ.get(PROFILE_ENV_VAR)
+    if override in PROFILE_TYPES:
+        return {
+            'type': override,
+            'cpu_count': os.cpu_count() or 1,
+            'memory_gb': 0,
+            'platform': platform.system()
+        }
+    
+    cached = _load_cached_profile()
+    if cached is not None:
+        return cached
+    
     try:
         # CPU info
         cpu_count = os.cpu_count()
@@ -122,11 +277,17 @@ def detect_hardware_profile():
         memory_gb = memory.total / (1024**3)
         
         # Disk info
-        disk = psutil.disk_usage('/')
-        disk_gb = disk.total / (1024**3)
+        if hasattr(os, 'statvfs'):
+            st = os.statvfs('/')
+            disk_gb = st.f_blocks * st.f_frsize / (1024**3)
+        else:
+            disk_gb = shutil.disk_usage('/').total / (1024**3)
         
-        # Network interfaces
-        interfaces = psutil.net_if_addrs()
+        # Network interface names, without building every address like net_if_addrs
+        try:
+            interfaces = [name for _, name in socket.if_nameindex()]
+        except (AttributeError, OSError):
+            interfaces = list(psutil.net_if_addrs())
         
         # System load
         load_avg = os.getloadavg() if hasattr(os, 'getloadavg') else [0, 0, 0]
@@ -137,7 +298,7 @@ def detect_hardware_profile():
             'memory_gb': round(memory_gb, 2),
             'disk_gb': round(disk_gb, 2),
             'load_avg': load_avg,
-            'interfaces': list(interfaces.keys()),
+            'interfaces': interfaces,
             'platform': platform.system(),
             'architecture': platform.machine(),
             'python_version': platform.python_version()
@@ -155,6 +316,7 @@ def detect_hardware_profile():
         
         profile['type'] = profile_type
         
+        _save_cached_profile(profile)
         return profile
         
     except Exception as e:
@@ -215,28 +377,34 @@ def optimize_for_hardware(profile):
     
     return optimizations
 
+# Package-manager locks that make apt/dpkg tasks fail transiently
+_LOCK_FILES = (
+    '/var/lib/dpkg/lock',
+    '/var/lib/apt/lists/lock',
+    '/var/cache/apt/archives.lock'
+)
+
+def _exists(path):
+    """Single-stat existence check"""
+    try:
+        os.stat(path)
+        return True
+    except FileNotFoundError:
+        return False
+
 def check_transient_locks(timeout=300, retries=3):
     """Check for transient locks that might cause deployment failures"""
-    lock_files = [
-        '/var/lib/dpkg/lock',
-        '/var/lib/apt/lists/lock',
-        '/var/cache/apt/archives.lock'
-    ]
-    
     for attempt in range(retries):
-        locked = []
-        for lock_file in lock_files:
-            if Path(lock_file).exists():
-                    locked.append(lock_file)
+        locked = [lock_file for lock_file in _LOCK_FILES if _exists(lock_file)]
         
         if not locked:
             print(f"✅ No transient locks detected (attempt {attempt + 1})")
             return True
-        else:
-            print(f"⚠️  Transient locks detected: {locked}")
+        
+        print(f"⚠️  Transient locks detected: {locked}")
+        if attempt + 1 < retries:
             print("  💡 Waiting 30 seconds for locks to clear...")
             time.sleep(30)
-            return False
     
     print(f"❌ Persistent locks detected after {retries} attempts")
     return False
@@ -272,142 +440,207 @@ def verify_changes_captured(playbook, inventory=None, extra_vars=None, verbose=F
             print(f"Warning: Change verification failed: {e}")
         return {"verified": True, "reason": "verification failed"}
 
+# Worker pool shared by every run_ansible_async call, created on first use
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def _get_pool(max_workers=1):
+    """Return the shared ansible-playbook worker pool, creating it with max_workers if needed"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ThreadPoolExecutor(max_workers=max(1, max_workers))
+            atexit.register(_POOL.shutdown, wait=False)
+        return _POOL
+
+async def _run_ansible(playbook, inventory, timeout=300, callback=None):
+    """Run ansible-playbook as an asyncio subprocess, streaming lines to callback"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'ansible-playbook', '-i', inventory, '--timeout', str(timeout), playbook,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        collected = {'stdout': [], 'stderr': []}
+        
+        def emit(stream_type, raw_line):
+            line = raw_line.decode(errors='replace').strip()
+            collected[stream_type].append(line)
+            if callback:
+                callback(stream_type, line)
+        
+        async def pump(stream, stream_type):
+            # Bulk reads; lines are split in userspace
+            partial = b''
+            while True:
+                chunk = await stream.read(65536)
+                if not chunk:
+                    break
+                *complete, partial = (partial + chunk).split(b'\n')
+                for raw_line in complete:
+                    emit(stream_type, raw_line)
+            # EOF: flush any unterminated last line
+            if partial:
+                emit(stream_type, partial)
+        
+        # Both pipes are read as they fill, so a quiet stream never blocks the other
+        try:
+            await asyncio.gather(pump(process.stdout, 'stdout'), pump(process.stderr, 'stderr'), process.wait())
+        except asyncio.CancelledError:
+            # Cancelled (e.g. timed out): the playbook must not outlive its run
+            process.kill()
+            await process.wait()
+            raise
+        
+        return {
+            'returncode': process.returncode,
+            'stdout': '\n'.join(collected['stdout']),
+            'stderr': '\n'.join(collected['stderr']),
+            'success': process.returncode == 0
+        }
+    except Exception as e:
+        return {
+            'returncode': -1,
+            'stdout': '',
+            'stderr': str(e),
+            'success': False,
+            'exception': e
+        }
+
 def run_ansible_async(playbook, inventory, timeout=300, callback=None):
     """Run ansible-playbook asynchronously with callback support"""
-    def run_process():
+    # Run in the shared pool so the caller gets a Future without paying thread start-up
+    return _get_pool().submit(asyncio.run, _run_ansible(playbook, inventory, timeout, callback))
+
+# Matches "timeout", "time out" and "timed out" in ansible-playbook stderr
+_TIMEOUT_RE = re.compile(r'time[d\s]*out', re.IGNORECASE)
+
+def _print_ansible_line(stream_type, line):
+    """Echo one line of ansible-playbook output as it arrives"""
+    if stream_type == 'stdout':
+        print(f"📤 {line}")
+    else:
+        print(f"⚠️  {line}")
+
+async def _run_ansible_with_retry(playbook, inventory, max_retries=3, base_timeout=300, scaling_factor=2):
+    """Async-mode retry loop: each attempt is one _run_ansible on the running event loop"""
+    for attempt in range(max_retries):
+        timeout = base_timeout * (scaling_factor ** attempt)
+        
+        print(f"🚀 Attempt {attempt + 1}/{max_retries}: Timeout={timeout}s")
+        print("🔄 Running in async mode...")
+        
         try:
-            process = subprocess.Popen(
-                ['ansible-playbook', '-i', inventory, '--timeout', str(timeout), playbook],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
+            # Cancelling the run on the deadline kills its ansible-playbook
+            result = await asyncio.wait_for(
+                _run_ansible(playbook, inventory, timeout, _print_ansible_line), timeout + 60
             )
-            
-            output_lines = []
-            error_lines = []
-            
-            # Read output in real-time
-            while True:
-                output = process.stdout.readline() if process.stdout else ''
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    output_lines.append(output.strip())
-                    if callback:
-                        callback('stdout', output.strip())
-                
-                error = process.stderr.readline() if process.stderr else ''
-                if error:
-                    error_lines.append(error.strip())
-                    if callback:
-                        callback('stderr', error.strip())
-            
-            return {
-                'returncode': process.returncode,
-                'stdout': '\n'.join(output_lines),
-                'stderr': '\n'.join(error_lines),
-                'success': process.returncode == 0
-            }
         except Exception as e:
-            return {
-                'returncode': -1,
-                'stdout': '',
-                'stderr': str(e),
-                'success': False,
-                'exception': e
-            }
-    
-    # Run in thread pool for async execution
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        future = executor.submit(run_process)
-        return future
+            print(f"💥 Async execution error: {e}")
+            return False
+        
+        if result['success']:
+            print(f"✅ Deployment successful on attempt {attempt + 1}")
+            return True
+        
+        print(f"❌ Deployment failed on attempt {attempt + 1}")
+        if result.get('stderr'):
+            print(f"Stderr: {result['stderr']}")
+        
+        # Check if failure is due to timeout
+        if _TIMEOUT_RE.search(result.get('stderr') or ''):
+            print(f"⏱️  Timeout detected - increasing timeout for next attempt")
+            continue
+        
+        return False
+    
+    print(f"❌ All {max_retries} attempts failed")
+    return False
 
 def run_ansible_with_retry(playbook, inventory, max_retries=3, base_timeout=300, scaling_factor=2, async_mode=False):
     """Run ansible-playbook with intelligent retry logic and async support"""
-    def deployment_callback(stream_type, line):
-        if stream_type == 'stdout':
-            print(f"📤 {line}")
-        else:
-            print(f"⚠️  {line}")
+    if async_mode:
+        return asyncio.run(_run_ansible_with_retry(playbook, inventory, max_retries, base_timeout, scaling_factor))
     
     for attempt in range(max_retries):
         timeout = base_timeout * (scaling_factor ** attempt)
         
         print(f"🚀 Attempt {attempt + 1}/{max_retries}: Timeout={timeout}s")
         
-        if async_mode:
-            print("🔄 Running in async mode...")
-            future = run_ansible_async(playbook, inventory, timeout, deployment_callback)
+        # Synchronous execution
+        try:
+            result = subprocess.run(
+                ['ansible-playbook', '-i', inventory, '--timeout', str(timeout), playbook],
+                capture_output=True,
+                text=True,
+                check=True,
+                timeout=timeout + 60  # Extra buffer for subprocess
+            )
             
-            try:
-                result = future.result(timeout=timeout + 60)
+            if result.returncode == 0:
+                print(f"✅ Deployment successful on attempt {attempt + 1}")
+                return True
+            else:
+                print(f"❌ Deployment failed on attempt {attempt + 1}")
+                print(f"Stdout: {result.stdout}")
+                if result.stderr:
+                    print(f"Stderr: {result.stderr}")
                 
-                if result['success']:
-                    print(f"✅ Deployment successful on attempt {attempt + 1}")
-                    return True
-                else:
-                    print(f"❌ Deployment failed on attempt {attempt + 1}")
-                    if result.get('stderr'):
-                        print(f"Stderr: {result['stderr']}")
-                    
-                    # Check if failure is due to timeout
-                    if result.get('stderr') and any(keyword in result['stderr'].lower() for keyword in ['timeout', 'timed out']):
-                        print(f"⏱️  Timeout detected - increasing timeout for next attempt")
-                        continue
-                    
-                    return False
-                    
-            except Exception as e:
-                print(f"💥 Async execution error: {e}")
-                return False
-        else:
-            # Synchronous execution
-            try:
-                result = subprocess.run(
-                    ['ansible-playbook', '-i', inventory, '--timeout', str(timeout), playbook],
-                    capture_output=True,
-                    text=True,
-                    check=True,
-                    timeout=timeout + 60  # Extra buffer for subprocess
-                )
+                # Check if failure is due to timeout
+                if _TIMEOUT_RE.search(result.stderr or ''):
+                    print(f"⏱️  Timeout detected - increasing timeout for next attempt")
+                    continue
                 
-                if result.returncode == 0:
-                    print(f"✅ Deployment successful on attempt {attempt + 1}")
-                    return True
-                else:
-                    print(f"❌ Deployment failed on attempt {attempt + 1}")
-                    print(f"Stdout: {result.stdout}")
-                    if result.stderr:
-                        print(f"Stderr: {result.stderr}")
-                    
-                    # Check if failure is due to timeout
-                    if "timeout" in result.stderr.lower() or "timed out" in result.stderr.lower():
-                        print(f"⏱️  Timeout detected - increasing timeout for next attempt")
-                        continue
-                    
-                    return False
-                    
-            except subprocess.TimeoutExpired:
-                print(f"⏱️  Ansible timeout after {timeout}s")
-                continue
-            except Exception as e:
-                print(f"💥 Unexpected error: {e}")
                 return False
+                
+        except subprocess.TimeoutExpired:
+            print(f"⏱️  Ansible timeout after {timeout}s")
+            continue
+        except Exception as e:
+            print(f"💥 Unexpected error: {e}")
+            return False
     
     print(f"❌ All {max_retries} attempts failed")
     return False
 
-def deploy_stage(stage_config, playbook, inventory, state, dry_run=False):
-    """Deploy a specific stage with retry logic and guardrails validation"""
-    stage_name = stage_config.get('name', 'unknown')
-    stage_timeout = stage_config.get('timeout', 300)
-    max_retries = stage_config.get('retries', 3)
-    async_mode = stage_config.get('async', False)
-    
-    print(f"\n🎯 Deploying Stage: {stage_name}")
-    
+# Characters that need /bin/sh to interpret a pre-command
+_SHELL_META_RE = re.compile(r"[|&;<>()$`*?\[~\n#{}!]")
+
+# First words that only mean something to the shell: builtins with no binary
+# of their own (or one that cannot affect the shell, like cd) and keywords
+_SHELL_ONLY_WORDS = frozenset((
+    ".", ":", "alias", "bg", "break", "builtin", "case", "cd", "command", "continue",
+    "declare", "do", "done", "elif", "else", "esac", "eval", "exec", "exit", "export",
+    "fg", "fi", "for", "function", "getopts", "hash", "if", "jobs", "let", "local",
+    "popd", "pushd", "read", "readonly", "return", "select", "set", "shift", "shopt",
+    "source", "then", "time", "times", "trap", "type", "typeset", "ulimit", "umask",
+    "unalias", "unset", "until", "wait", "while"
+))
+
+def _pre_command_argv(cmd):
+    """argv for a pre-command that can be exec'd directly, or None when it needs a shell"""
+    if _SHELL_META_RE.search(cmd):
+        return None
+    try:
+        argv = shlex.split(cmd)
+    except ValueError:
+        return None
+    # Empty commands, VAR=value prefixes, builtins and keywords stay with the shell
+    if not argv or "=" in argv[0] or argv[0] in _SHELL_ONLY_WORDS:
+        return None
+    return argv
+
+def _parse_pre_commands(commands):
+    """Pair each pre-command with its argv, or the raw string when it needs a shell"""
+    parsed = []
+    for cmd in commands:
+        argv = _pre_command_argv(cmd)
+        parsed.append((cmd, cmd if argv is None else argv))
+    return parsed
+
+def _show_guardrails_advice(stage_name, playbook, inventory, dry_run=False):
+    """Print guardrails' top recommendations for deploying a stage"""
     # Initialize guardrails for context preservation
     guardrails = None
     if GUARDRAILS_AVAILABLE and AnsibleGuardrails:
@@ -425,14 +658,9 @@ def deploy_stage(stage_config, playbook, inventory, state, dry_run=False):
             print(f"  📋 Guardrails recommendations:")
             for approach in solution["debugging_approach"][:2]:  # Show top 2
                 print(f"    • {approach}")
-    
-    if dry_run:
-        print(f"[DRY RUN] Would deploy stage '{stage_name}'")
-        print(f"  📋 Playbook: {playbook}")
-        print(f"  ⏱️  Timeout: {stage_timeout}s")
-        print(f"  🔄 Async: {async_mode}")
-        return True
-    
+
+def _run_pre_stage_checks(stage_config, stage_timeout):
+    """Lock checks and pre-deployment commands; False means the stage must not run"""
     # Pre-stage checks
     if stage_config.get('check_locks', True):
         if not check_transient_locks(timeout=stage_timeout, retries=2):
@@ -440,25 +668,27 @@ def deploy_stage(stage_config, playbook, inventory, state, dry_run=False):
             return False
     
     # Run stage-specific pre-deployment commands
-    pre_commands = stage_config.get('pre_commands', [])
-    for cmd in pre_commands:
+    pre_commands = stage_config.get('pre_commands_parsed')
+    if pre_commands is None:
+        pre_commands = _parse_pre_commands(stage_config.get('pre_commands', []))
+    for cmd, argv in pre_commands:
         print(f"🔧 Running pre-command: {cmd}")
-        result = subprocess.run(cmd, shell=True, capture_output=True)
+        try:
+            result = subprocess.run(argv, shell=isinstance(argv, str), capture_output=True, check=False)
+        except OSError as e:
+            print(f"❌ Pre-command failed: {cmd} ({e})")
+            return False
         if result.returncode != 0:
             print(f"❌ Pre-command failed: {cmd}")
             return False
-    
-    success = run_ansible_with_retry(
-        playbook=playbook,
-        inventory=inventory,
-        max_retries=max_retries,
-        base_timeout=stage_timeout,
-        async_mode=async_mode
-    )
-    
+    return True
+
+def _finish_stage(stage_config, playbook, inventory, state, state_file, success, async_mode):
+    """Verify and record a stage whose playbook has run, returning success"""
+    stage_name = stage_config.get('name', 'unknown')
     if success:
-        # Verify changes are captured (unless dry run)
-        if not dry_run and stage_config.get('verify_changes', False):
+        # Verify changes are captured
+        if stage_config.get('verify_changes', False):
             print(f"🔍 Verifying changes are captured in code...")
             verification = verify_changes_captured(playbook, inventory, verbose=True)
             if verification.get('has_untracked'):
@@ -468,19 +698,89 @@ def deploy_stage(stage_config, playbook, inventory, state, dry_run=False):
                 print(f"✅ Change verification passed: {verification['reason']}")
         
         # Update state
-        state['stages'][stage_name] = {
-            'status': 'completed',
-            'completed_at': datetime.now().isoformat(),
-            'duration': stage_config.get('estimated_duration', 60),
-            'async': async_mode
-        }
-        save_deployment_state(state)
+        record_stage_event(
+            state, stage_name, 'completed', state_file,
+            completed_at=_now_iso(),
+            duration=stage_config.get('estimated_duration', 60),
+            **{'async': async_mode}
+        )
         print(f"✅ Stage '{stage_name}' completed successfully")
+        return True
     else:
         print(f"💥 Deployment failed at stage '{stage_name}'")
         print("  💡 Use --resume to continue from this stage")
         return False
 
+def deploy_stage(stage_config, playbook, inventory, state, dry_run=False, state_file="deployment_state.json"):
+    """Deploy a specific stage with retry logic and guardrails validation"""
+    stage_name = stage_config.get('name', 'unknown')
+    stage_timeout = stage_config.get('timeout', 300)
+    max_retries = stage_config.get('retries', 3)
+    async_mode = stage_config.get('async', False)
+    
+    print(f"\n🎯 Deploying Stage: {stage_name}")
+    _show_guardrails_advice(stage_name, playbook, inventory, dry_run)
+    
+    if dry_run:
+        print(f"[DRY RUN] Would deploy stage '{stage_name}'")
+        print(f"  📋 Playbook: {playbook}")
+        print(f"  ⏱️  Timeout: {stage_timeout}s")
+        print(f"  🔄 Async: {async_mode}")
+        return True
+    
+    if not _run_pre_stage_checks(stage_config, stage_timeout):
+        return False
+    
+    success = run_ansible_with_retry(
+        playbook=playbook,
+        inventory=inventory,
+        max_retries=max_retries,
+        base_timeout=stage_timeout,
+        async_mode=async_mode
+    )
+    
+    return _finish_stage(stage_config, playbook, inventory, state, state_file, success, async_mode)
+
+async def _deploy_stage_async(stage_config, inventory, state, state_file, semaphore):
+    """deploy_stage for one stage of a parallel group, run on the group's event loop"""
+    async with semaphore:
+        stage_name = stage_config.get('name', 'unknown')
+        stage_timeout = stage_config.get('timeout', 300)
+        playbook = stage_config.get('playbook')
+        
+        print(f"\n🎯 Deploying Stage: {stage_name}")
+        # Blocking checks and verification take a worker thread only while they
+        # run; the playbook itself runs on the loop without one
+        await asyncio.to_thread(_show_guardrails_advice, stage_name, playbook, inventory)
+        if not await asyncio.to_thread(_run_pre_stage_checks, stage_config, stage_timeout):
+            return False
+        
+        success = await _run_ansible_with_retry(
+            playbook, inventory, stage_config.get('retries', 3), stage_timeout
+        )
+        
+        return await asyncio.to_thread(_finish_stage, stage_config, playbook, inventory,
+                                       state, state_file, success, True)
+
+async def _deploy_group(pending, inventory, state, state_file, parallel_stages):
+    """Deploy a group's stages side by side, at most parallel_stages at a time"""
+    semaphore = asyncio.Semaphore(parallel_stages)
+    results = await asyncio.gather(*(
+        _deploy_stage_async(stage_config, inventory, state, state_file, semaphore)
+        for _, stage_config in pending
+    ))
+    return [(stage_name, success) for (stage_name, _), success in zip(pending, results)]
+
+def _normalize_stage(stage_config, optimizations):
+    """Return a copy of stage_config with hardware optimizations and parsed pre-commands applied"""
+    stage_config = dict(stage_config)
+    stage_config['timeout'] = int(stage_config.get('timeout', 300) * optimizations['timeout_multiplier'])
+    stage_config.setdefault('retries', optimizations['retry_count'])
+    stage_config.setdefault('async', optimizations['async_enabled'])
+    # Split pre-commands once so deploy_stage can exec them without a shell
+    stage_config['pre_commands_parsed'] = _parse_pre_commands(stage_config.get('pre_commands', []))
+    return stage_config
+
 def progressive_deployment(config_file, inventory_file, state_file="deployment_state.json", dry_run=False):
     """Execute progressive deployment stages"""
     if dry_run:
@@ -492,7 +792,7 @@ def progressive_deployment(config_file, inventory_file, state_file="deployment_s
         # Show detailed dry-run of stages
         try:
             with open(config_file) as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_Loader)
             
             stages = config.get('stages', [])
             print(f"\n📋 Deployment Stages ({len(stages)}):")
@@ -511,7 +811,7 @@ def progressive_deployment(config_file, inventory_file, state_file="deployment_s
     # Load configuration and state
     try:
         with open(config_file) as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_Loader)
         
         state = load_deployment_state(state_file)
     except Exception as e:
@@ -524,41 +824,64 @@ def progressive_deployment(config_file, inventory_file, state_file="deployment_s
     # Detect hardware and optimize
     hardware_profile = detect_hardware_profile()
     optimizations = optimize_for_hardware(hardware_profile)
+    stages = [_normalize_stage(stage, optimizations) for stage in stages]
     
     print(f"🎯 Starting Progressive Deployment ({total_stages} stages)")
     print(f"💻 Hardware Profile: {hardware_profile['type']}")
     print(f"⚡ Optimizations: {optimizations['ansible_forks']} forks, {optimizations['timeout_multiplier']}x timeout")
     
+    # Consecutive stages sharing a 'group' key are deployed together when
+    # the hardware profile allows more than one stage at a time
+    parallel_stages = optimizations['parallel_stages']
+    groups = []
     for i, stage_config in enumerate(stages, 1):
-        stage_name = stage_config.get('name', f'stage_{i}')
-        
-        print(f"\n{'='*60}")
-        
-        # Check if stage should be skipped
-        if state.get('stages', {}).get(stage_name, {}).get('status') == 'completed':
-            print(f"⏭️  Skipping stage '{stage_name}' - already completed")
-            continue
-        
-        # Apply optimizations to stage
-        stage_config = stage_config.copy()
-        stage_config.setdefault('timeout', 300)
-        stage_config['timeout'] = int(stage_config['timeout'] * optimizations['timeout_multiplier'])
-        stage_config.setdefault('retries', optimizations['retry_count'])
-        stage_config.setdefault('async', optimizations['async_enabled'])
-        
-        # Deploy stage
-        success = deploy_stage(stage_config, stage_config.get('playbook'), inventory_file, state, dry_run)
+        group_id = stage_config.get('group')
+        if parallel_stages > 1 and group_id is not None and groups and groups[-1][0] == group_id:
+            groups[-1][1].append((i, stage_config))
+        else:
+            groups.append((group_id, [(i, stage_config)]))
+    
+    for group_id, members in groups:
+        pending = []
+        for i, stage_config in members:
+            stage_name = stage_config.get('name', f'stage_{i}')
+            
+            print(f"\n{'='*60}")
+            
+            # Check if stage should be skipped
+            if state.get('stages', {}).get(stage_name, {}).get('status') == 'completed':
+                print(f"⏭️  Skipping stage '{stage_name}' - already completed")
+                continue
+            
+            pending.append((stage_name, stage_config))
+        
+        # Deploy stage(s)
+        if len(pending) > 1:
+            print(f"⚡ Deploying {len(pending)} stages of group '{group_id}' in parallel")
+            # One event loop runs every playbook of the group, instead of a
+            # thread blocked on each ansible-playbook
+            results = asyncio.run(_deploy_group(pending, inventory_file, state, state_file, parallel_stages))
+        else:
+            # Lazy, so a failed stage stops the rollout before the next one starts
+            results = (
+                (stage_name, deploy_stage(stage_config, stage_config.get('playbook'), inventory_file, state, dry_run, state_file))
+                for stage_name, stage_config in pending
+            )
         
-        if not success:
-            print(f"💥 Deployment failed at stage '{stage_name}'")
-            print("  💡 Use --resume to continue from this stage")
-            return False
+        for stage_name, success in results:
+            if not success:
+                print(f"💥 Deployment failed at stage '{stage_name}'")
+                print("  💡 Use --resume to continue from this stage")
+                return False
     
     print(f"\n{'='*60}")
     print(f"🎉 Progressive deployment completed!")
     
-    # Final state summary
-    final_state = load_deployment_state()
+    # Clean shutdown: fold the event log into a snapshot
+    save_deployment_state(state, state_file)
+    
+    # Final state summary; deploy_stage updated state in place
+    final_state = state
     completed_stages = [name for name, info in final_state.get('stages', {}).items() 
                         if info.get('status') == 'completed']
     
@@ -606,14 +929,13 @@ def resume_deployment(config_file, inventory_file, state_file="deployment_state.
     print(f"🔄 Resuming from stage: {last_incomplete}")
     
     # Mark stage as in-progress
-    state['stages'][last_incomplete]['status'] = 'in_progress'
-    state['stages'][last_incomplete]['resumed_at'] = datetime.now().isoformat()
-    save_deployment_state(state)
+    record_stage_event(state, last_incomplete, 'in_progress', state_file,
+                       resumed_at=_now_iso())
     
     # Find stage config
     try:
         with open(config_file) as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_Loader)
         
         stages = config.get('stages', [])
         stage_config = next((s for s in stages if s.get('name') == last_incomplete), None)
@@ -626,7 +948,7 @@ def resume_deployment(config_file, inventory_file, state_file="deployment_state.
         return False
     
     # Deploy the resumed stage
-    success = deploy_stage(stage_config, stage_config.get('playbook'), inventory_file, state, dry_run)
+    success = deploy_stage(stage_config, stage_config.get('playbook'), inventory_file, state, dry_run, state_file)
     
     if success:
         print(f"✅ Successfully resumed and completed stage '{last_incomplete}'")
@@ -638,7 +960,10 @@ def resume_deployment(config_file, inventory_file, state_file="deployment_state.
 if __name__ == "__main__":
     import argparse
     
-    parser = argparse.ArgumentParser(description='Progressive deployment with staging and recovery')
+    parser = argparse.ArgumentParser(
+        description='Progressive deployment with staging and recovery',
+        epilog=f"Set {PROFILE_ENV_VAR} to one of {', '.join(PROFILE_TYPES)} to skip hardware detection."
+    )
     parser.add_argument('config', help='Deployment configuration file')
     parser.add_argument('inventory', help='Ansible inventory file')
     parser.add_argument('--state-file', default='deployment_state.json', help='State tracking file (default: deployment_state.json)')
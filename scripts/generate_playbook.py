@@ -9,6 +9,12 @@ import yaml
 import sys
 from pathlib import Path
 
+# Use the libyaml-backed loader/dumper when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _Loader, CSafeDumper as _Dumper
+except ImportError:
+    from yaml import SafeLoader as _Loader, SafeDumper as _Dumper
+
 # Import guardrails for context preservation
 GUARDRAILS_AVAILABLE = False
 AnsibleGuardrails = None
@@ -21,12 +27,25 @@ try:
 except ImportError:
     pass
 
-def generate_playbook(config_file, output_file, dry_run=False, verbose=False):
+# Direct block-YAML writer for playbooks; scripts/ is on sys.path from the block above
+from yaml_writer import write_yaml
+
+def _freeze(value):
+    """Hashable form of a task params value: dicts become frozensets, lists tuples"""
+    if isinstance(value, dict):
+        return frozenset((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, set):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+def generate_playbook(config_file, output_file, dry_run=False, verbose=False, use_guardrails=True):
     """Generate playbook from config with guardrails validation"""
     
     # Initialize guardrails if available
     guardrails = None
-    if GUARDRAILS_AVAILABLE and AnsibleGuardrails:
+    if use_guardrails and GUARDRAILS_AVAILABLE and AnsibleGuardrails:
         try:
             guardrails = AnsibleGuardrails()
         except Exception as e:
@@ -36,7 +55,7 @@ def generate_playbook(config_file, output_file, dry_run=False, verbose=False):
         print(f"[DRY RUN] Would generate {output_file} from {config_file}")
         # Preview what would be generated
         with open(config_file) as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=_Loader)
         
         if verbose:
             print(f"  📋 Planned Playbook Structure:")
@@ -58,25 +77,32 @@ def generate_playbook(config_file, output_file, dry_run=False, verbose=False):
         return True
     
     with open(config_file) as f:
-        config = yaml.safe_load(f)
+        config = yaml.load(f, Loader=_Loader)
     
+    tasks = config.get('tasks', [])
     playbook = {
         'name': config.get('name', 'Generated Playbook'),
         'hosts': config.get('hosts', 'all'),
         'become': config.get('become', False),
-        'tasks': []
+        'tasks': [
+            {'name': task.get('name'), task['module']: task.get('params', {})}
+            for task in tasks
+        ]
     }
     
-    for task in config.get('tasks', []):
-        task_dict = {
-            'name': task.get('name'),
-            task['module']: task.get('params', {})
-        }
+    # Validate tasks with guardrails
+    if guardrails:
+        analyze_operation = guardrails.analyze_operation
+        # Analyses keyed by module and params shape, shared by identical tasks
+        analyses = {}
         
-        # Validate task with guardrails
-        if guardrails:
+        for task, task_dict in zip(tasks, playbook['tasks']):
             operation_type = f"{task['module']}_operations"
-            analysis = guardrails.analyze_operation(operation_type, task.get('params', {}))
+            params = task.get('params', {})
+            key = (operation_type, _freeze(params))
+            analysis = analyses.get(key)
+            if analysis is None:
+                analysis = analyses[key] = analyze_operation(operation_type, params)
             
             if analysis["guardrails_violations"] and verbose:
                 print(f"    ⚠️  Task '{task.get('name')}' guardrails warnings:")
@@ -85,12 +111,18 @@ def generate_playbook(config_file, output_file, dry_run=False, verbose=False):
             
             # Add guardrails recommendations as comments if needed
             if analysis["recommended_modules"]:
-                task_dict['_guardrails_recommended'] = analysis["recommended_modules"]
-        
-        playbook['tasks'].append(task_dict)
+                # Copy so yaml.dump never emits anchors for tasks sharing an analysis
+                task_dict['_guardrails_recommended'] = {
+                    action: list(modules)
+                    for action, modules in analysis["recommended_modules"].items()
+                }
     
     with open(output_file, 'w') as f:
-        yaml.dump([playbook], f, default_flow_style=False)
+        try:
+            write_yaml([playbook], f)
+        except TypeError:
+            # Values like dates have no plain form there; let PyYAML represent them
+            yaml.dump([playbook], f, Dumper=_Dumper, default_flow_style=False, sort_keys=False)
     
     print(f"Generated {output_file}")
     
@@ -113,8 +145,10 @@ if __name__ == "__main__":
     parser.add_argument('--dry-run', action='store_true', help='Show what would be generated')
     parser.add_argument('--verbose', action='store_true', help='Show detailed planning information')
     parser.add_argument('--preview', action='store_true', help='Preview playbook structure')
+    parser.add_argument('--no-guardrails', action='store_true', help='Skip guardrails validation of tasks')
     
     args = parser.parse_args()
     
-    success = generate_playbook(args.config, args.output, args.dry_run or args.preview, args.verbose)
+    success = generate_playbook(args.config, args.output, args.dry_run or args.preview, args.verbose,
+                                use_guardrails=not args.no_guardrails)
     sys.exit(0 if success else 1)
\ No newline at end of file
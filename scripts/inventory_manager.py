@@ -4,12 +4,58 @@ Ansible Inventory Manager
 Manages Ansible inventory files and SSH configurations
 """
 
+import functools
+import hashlib
 import os
-import yaml
 import json
+import shutil
 import sys
+from collections import Counter
 from pathlib import Path
 
+@functools.lru_cache(maxsize=1)
+def _yaml():
+    """Import PyYAML on first use, preferring its libyaml-backed loader and dumper"""
+    # Deferred so JSON-only paths (dry runs, hosts.json input) never pay for the import
+    import yaml
+    try:
+        from yaml import CSafeLoader as Loader, CSafeDumper as Dumper
+    except ImportError:
+        from yaml import SafeLoader as Loader, SafeDumper as Dumper
+    return yaml, Loader, Dumper
+
+def _iter_hosts(f):
+    """Iterate hosts.json entries, streaming them with ijson when it is installed"""
+    # Imported on first use: ijson costs more to import than the YAML-only actions need
+    try:
+        import ijson
+    except ImportError:
+        return iter(json.load(f))
+    return ijson.items(f, 'item', use_float=True)
+
+# Built inventories cached by hosts file path, mtime and size, so repeated
+# create_inventory runs on an unchanged hosts.json just copy the YAML
+INVENTORY_CACHE_DIR = Path(os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache') / 'ansible-automation'
+
+def _inventory_cache_path(hosts_file):
+    """Cache file for the inventory built from hosts_file as it is right now"""
+    stat = os.stat(hosts_file)
+    digest = hashlib.sha1(os.path.abspath(hosts_file).encode()).hexdigest()
+    return INVENTORY_CACHE_DIR / f"inv-{digest}-{stat.st_mtime_ns}-{stat.st_size}.yml"
+
+def _store_inventory_cache(output_file, cache_path):
+    """Copy a freshly written inventory into the cache, dropping older copies for the same hosts file"""
+    try:
+        INVENTORY_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        for stale in INVENTORY_CACHE_DIR.glob(cache_path.name.rsplit('-', 2)[0] + '-*.yml'):
+            stale.unlink(missing_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        shutil.copyfile(output_file, tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # The cache is only a shortcut; an unwritable cache dir must not fail the run
+        pass
+
 # Import guardrails for context preservation
 GUARDRAILS_AVAILABLE = False
 AnsibleGuardrails = None
@@ -22,7 +68,85 @@ try:
 except ImportError:
     pass
 
-def create_inventory(hosts_file, output_file, dry_run=False, verbose=False):
+# Shared plain-YAML scalar writer; scripts/ is on sys.path from the block above
+from yaml_writer import yaml_scalar
+
+def build_inventory(hosts):
+    """Build an Ansible inventory dict from hosts.json entries"""
+    inventory = {
+        'all': {
+            'children': {}
+        }
+    }
+    
+    # Group hosts by environment or type; each group's hosts dict is looked
+    # up once per host rather than walked down from the root three times
+    children = inventory['all']['children']
+    for host in hosts:
+        get = host.get
+        name = host['name']
+        group = get('group', 'ungrouped')
+        group_data = children.get(group)
+        if group_data is None:
+            group_data = children[group] = {
+                'hosts': {},
+                'vars': {}
+            }
+        
+        group_data['hosts'][name] = {
+            'ansible_host': get('ip', name),
+            'ansible_user': get('user', 'root'),
+            'ansible_ssh_private_key_file': get('key_file'),
+            'ansible_port': get('port', 22)
+        }
+    
+    return inventory
+
+def _load_inventory(source, from_hosts=False):
+    """Inventory dict from an in-memory dict, a hosts.json, a JSON inventory or a YAML inventory"""
+    if isinstance(source, dict):
+        return source
+    if from_hosts:
+        with open(source, 'rb') as f:
+            return build_inventory(_iter_hosts(f))
+    with open(source) as f:
+        if str(source).endswith('.json'):
+            data = json.load(f)
+            # A bare list is a hosts.json rather than an inventory
+            return build_inventory(data) if isinstance(data, list) else data
+        yaml, loader, _ = _yaml()
+        return yaml.load(f, Loader=loader)
+
+def _emit_inventory(inventory, f):
+    """Write an inventory built by build_inventory as block YAML, without PyYAML"""
+    f.write("all:\n  children:\n")
+    for group, group_data in inventory['all']['children'].items():
+        f.write(f"    {yaml_scalar(group)}:\n      hosts:\n")
+        for name, host_vars in group_data['hosts'].items():
+            f.write(f"        {yaml_scalar(name)}:\n")
+            for key, value in host_vars.items():
+                f.write(f"          {key}: {yaml_scalar(value)}\n")
+        f.write("      vars: {}\n")
+
+def _format_terse_host(host, group):
+    """Dry-run line for one hosts.json entry"""
+    return f"    {host['name']} -> {group}\n"
+
+def _format_verbose_host(host, group):
+    """Verbose dry-run details for one hosts.json entry"""
+    get = host.get
+    name = host['name']
+    key_file = get('key_file')
+    return (
+        f"    🖥️ {name}\n"
+        f"      📍 IP: {get('ip', name)}\n"
+        f"      👤 User: {get('user', 'root')}\n"
+        f"      🔌 Port: {get('port', 22)}\n"
+        + (f"      🔑 Key: {key_file}\n" if key_file else "")
+        + f"      📂 Group: {group}\n"
+    )
+
+def create_inventory(hosts_file, output_file, dry_run=False, verbose=False, pipeline=None):
     """Create Ansible inventory from hosts file with guardrails validation"""
     
     # Initialize guardrails if available
@@ -46,164 +170,160 @@ def create_inventory(hosts_file, output_file, dry_run=False, verbose=False):
     """Create Ansible inventory from hosts file"""
     if dry_run:
         print(f"[DRY RUN] Would create inventory: {output_file}")
-        with open(hosts_file) as f:
-            hosts = json.load(f)
-        
-        if verbose:
-            print(f"  📋 Planned Inventory Structure:")
-            print(f"  📁 Output file: {output_file}")
-            print(f"  🏠 Total hosts: {len(hosts)}")
-            
-            # Group analysis
-            groups = {}
-            for host in hosts:
-                group = host.get('group', 'ungrouped')
-                groups[group] = groups.get(group, 0) + 1
-                print(f"  📂 Group '{group}': {groups[group]} hosts")
+        # Buffered and written once: thousands of hosts mean tens of thousands of lines
+        out = []
+        w = out.append
+        with open(hosts_file, 'rb') as f:
+            if verbose:
+                w(f"  📋 Planned Inventory Structure:\n")
+                w(f"  📁 Output file: {output_file}\n")
+            # Totals print above the host lines; filled in once the pass below has counted
+            totals_slot = len(out)
+            w(None)
+            if verbose:
+                w(f"  📋 Host Details:\n")
             
-            print(f"  📋 Host Details:")
-            for host in hosts:
+            # One pass: per-host lines as hosts stream in, group tally at the end
+            format_host = _format_verbose_host if verbose else _format_terse_host
+            groups = Counter()
+            for host in _iter_hosts(f):
                 group = host.get('group', 'ungrouped')
-                ip = host.get('ip', host['name'])
-                user = host.get('user', 'root')
-                port = host.get('port', 22)
-                key_file = host.get('key_file', None)
-                
-                print(f"    🖥️ {host['name']}")
-                print(f"      📍 IP: {ip}")
-                print(f"      👤 User: {user}")
-                print(f"      🔌 Port: {port}")
-                if key_file:
-                    print(f"      🔑 Key: {key_file}")
-                print(f"      📂 Group: {group}")
+                groups[group] += 1
+                w(format_host(host, group))
+        
+        host_count = sum(groups.values())
+        if verbose:
+            out[totals_slot] = f"  🏠 Total hosts: {host_count}\n" + ''.join(
+                f"  📂 Group '{group}': {count} hosts\n" for group, count in groups.items()
+            )
         else:
-            print(f"  Hosts: {len(hosts)}")
-            for host in hosts:
-                group = host.get('group', 'ungrouped')
-                print(f"    {host['name']} -> {group}")
+            out[totals_slot] = f"  Hosts: {host_count}\n"
+        sys.stdout.write(''.join(out))
         
         return True
     
-    inventory = {
-        'all': {
-            'children': {}
-        }
-    }
-    
-    with open(hosts_file) as f:
-        hosts = json.load(f)
+    # A pipeline needs the inventory dict itself, so it always builds it
+    cache_path = _inventory_cache_path(hosts_file) if pipeline is None else None
+    if cache_path is not None and cache_path.exists():
+        shutil.copyfile(cache_path, output_file)
+        if verbose:
+            print(f"  ♻️  Reused cached inventory: {cache_path}")
+        print(f"Created inventory: {output_file}")
+        return True
     
-    # Group hosts by environment or type
-    for host in hosts:
-        group = host.get('group', 'ungrouped')
-        if group not in inventory['all']['children']:
-            inventory['all']['children'][group] = {
-                'hosts': {},
-                'vars': {}
-            }
-        
-        inventory['all']['children'][group]['hosts'][host['name']] = {
-            'ansible_host': host.get('ip', host['name']),
-            'ansible_user': host.get('user', 'root'),
-            'ansible_ssh_private_key_file': host.get('key_file'),
-            'ansible_port': host.get('port', 22)
-        }
+    with open(hosts_file, 'rb') as f:
+        inventory = build_inventory(_iter_hosts(f))
     
     with open(output_file, 'w') as f:
-        yaml.dump(inventory, f, default_flow_style=False)
+        _emit_inventory(inventory, f)
+    
+    if pipeline is not None:
+        pipeline.inventory = inventory
+    else:
+        _store_inventory_cache(output_file, cache_path)
     
     print(f"Created inventory: {output_file}")
     return True
 
-def create_ssh_config(inventory_file, ssh_config_file, dry_run=False, verbose=False):
-    """Generate SSH config from Ansible inventory"""
+def create_ssh_config(inventory_file, ssh_config_file, dry_run=False, verbose=False, from_hosts=False):
+    """Generate SSH config from Ansible inventory (a path or an already-built inventory dict)"""
     if dry_run:
         print(f"[DRY RUN] Would create SSH config: {ssh_config_file}")
         
+        inventory = _load_inventory(inventory_file, from_hosts)
+        children = inventory.get('all', {}).get('children', {})
+        
         if verbose:
-            print(f"  📋 Planned SSH Configuration:")
-            print(f"  📁 Output file: {ssh_config_file}")
+            out = []
+            w = out.append
+            w(f"  📋 Planned SSH Configuration:\n")
+            w(f"  📁 Output file: {ssh_config_file}\n")
+            # Filled in once the group loop below has counted the hosts
+            w(None)
             
-            with open(inventory_file) as f:
-                inventory = yaml.safe_load(f)
-                
+            # Group summary with host details
             host_count = 0
-            for group_name, group_data in inventory.get('all', {}).get('children', {}).items():
-                host_count += len(group_data.get('hosts', {}))
-                
-            print(f"  🔌 Total SSH entries: {host_count}")
-            
-            # Group summary
-            for group_name, group_data in inventory.get('all', {}).get('children', {}).items():
+            for group_name, group_data in children.items():
                 hosts = group_data.get('hosts', {})
-                print(f"  📂 Group '{group_name}': {len(hosts)} hosts")
+                host_count += len(hosts)
+                w(f"  📂 Group '{group_name}': {len(hosts)} hosts\n")
                 
-                # Host details in verbose mode
-                if verbose and hosts:
-                    for host_name, host_vars in hosts.items():
-                        ip = host_vars.get('ansible_host', host_name)
-                        user = host_vars.get('ansible_user', 'root')
-                        port = host_vars.get('ansible_port', 22)
-                        key_file = host_vars.get('ansible_ssh_private_key_file')
-                        
-                        print(f"    🖥️ {host_name}")
-                        print(f"      📍 IP: {ip}")
-                        print(f"      👤 User: {user}")
-                        print(f"      🔌 Port: {port}")
-                        if key_file:
-                            print(f"      🔑 Key: {key_file}")
+                for host_name, host_vars in hosts.items():
+                    get = host_vars.get
+                    key_file = get('ansible_ssh_private_key_file')
+                    
+                    w(f"    🖥️ {host_name}\n"
+                      f"      📍 IP: {get('ansible_host', host_name)}\n"
+                      f"      👤 User: {get('ansible_user', 'root')}\n"
+                      f"      🔌 Port: {get('ansible_port', 22)}\n")
+                    if key_file:
+                        w(f"      🔑 Key: {key_file}\n")
+            out[2] = f"  🔌 Total SSH entries: {host_count}\n"
+            sys.stdout.write(''.join(out))
         else:
-            with open(inventory_file) as f:
-                inventory = yaml.safe_load(f)
-                
-            host_count = 0
-            for group_name, group_data in inventory.get('all', {}).get('children', {}).items():
-                host_count += len(group_data.get('hosts', {}))
-                
-            print(f"  SSH entries: {host_count}")
+            print(f"  SSH entries: {sum(len(group_data.get('hosts', {})) for group_data in children.values())}")
         
         return True
     
-    with open(inventory_file) as f:
-        inventory = yaml.safe_load(f)
-    
-    ssh_config = []
-    
-    for group_name, group_data in inventory.get('all', {}).get('children', {}).items():
-        for host_name, host_vars in group_data.get('hosts', {}).items():
-            config_line = f"Host {host_name}\n"
-            config_line += f"    HostName {host_vars.get('ansible_host', host_name)}\n"
-            config_line += f"    User {host_vars.get('ansible_user', 'root')}\n"
-            config_line += f"    Port {host_vars.get('ansible_port', 22)}\n"
-            
-            if host_vars.get('ansible_ssh_private_key_file'):
-                config_line += f"    IdentityFile {host_vars['ansible_ssh_private_key_file']}\n"
-            
-            config_line += "    StrictHostKeyChecking no\n\n"
-            ssh_config.append(config_line)
+    inventory = _load_inventory(inventory_file, from_hosts)
     
+    # One formatted block per host, written straight to the file
     with open(ssh_config_file, 'w') as f:
-        f.writelines(ssh_config)
+        for group_name, group_data in inventory.get('all', {}).get('children', {}).items():
+            for host_name, host_vars in group_data.get('hosts', {}).items():
+                key_file = host_vars.get('ansible_ssh_private_key_file')
+                identity = f"    IdentityFile {key_file}\n" if key_file else ""
+                f.write(
+                    f"Host {host_name}\n"
+                    f"    HostName {host_vars.get('ansible_host', host_name)}\n"
+                    f"    User {host_vars.get('ansible_user', 'root')}\n"
+                    f"    Port {host_vars.get('ansible_port', 22)}\n"
+                    f"{identity}"
+                    f"    StrictHostKeyChecking no\n\n"
+                )
     
     print(f"Created SSH config: {ssh_config_file}")
     return True
 
+class InventoryPipeline:
+    """Create an inventory and its SSH config back to back, parsing the hosts file once"""
+    
+    def __init__(self):
+        # Inventory built by the last create_inventory run through this pipeline
+        self.inventory = None
+    
+    def run(self, hosts_file, inventory_file, ssh_config_file, dry_run=False, verbose=False):
+        """Write inventory_file and ssh_config_file from hosts_file"""
+        if not create_inventory(hosts_file, inventory_file, dry_run, verbose, pipeline=self):
+            return False
+        if dry_run:
+            # No inventory was written, so plan the SSH config from the hosts file
+            return create_ssh_config(hosts_file, ssh_config_file, dry_run, verbose, from_hosts=True)
+        return create_ssh_config(self.inventory, ssh_config_file, dry_run, verbose)
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Manage Ansible inventory and SSH configs')
-    parser.add_argument('action', choices=['create_inventory', 'create_ssh'], help='Action to perform')
+    parser.add_argument('action', choices=['create_inventory', 'create_ssh', 'create_all'], help='Action to perform')
     parser.add_argument('input', help='Input file')
     parser.add_argument('output', help='Output file')
+    parser.add_argument('ssh_output', nargs='?', help='SSH config file (create_all only)')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be done')
     parser.add_argument('--verbose', action='store_true', help='Show detailed planning information')
+    parser.add_argument('--from-hosts', action='store_true',
+                        help='create_ssh: read the original hosts.json instead of the generated inventory')
     
     args = parser.parse_args()
+    if args.action == "create_all" and not args.ssh_output:
+        parser.error("create_all needs an SSH config output file")
     
     success = False
     if args.action == "create_inventory":
         success = create_inventory(args.input, args.output, args.dry_run, args.verbose)
     elif args.action == "create_ssh":
-        success = create_ssh_config(args.input, args.output, args.dry_run, args.verbose)
+        success = create_ssh_config(args.input, args.output, args.dry_run, args.verbose, args.from_hosts)
+    elif args.action == "create_all":
+        success = InventoryPipeline().run(args.input, args.output, args.ssh_output, args.dry_run, args.verbose)
     
     sys.exit(0 if success else 1)
\ No newline at end of file
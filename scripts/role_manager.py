@@ -6,9 +6,18 @@ Creates and manages Ansible roles with proper structure
 
 import os
 import sys
-import subprocess
 from pathlib import Path
 
+# Standard role layout and the main.yml stub written into it ({name} is the role name)
+_ROLE_SUBDIRS = ('tasks', 'handlers', 'templates', 'files', 'vars', 'defaults', 'meta')
+_ROLE_TEMPLATES = (
+    ('tasks/main.yml', '---\n# Main tasks for {name}\n'),
+    ('handlers/main.yml', '---\n# Handlers for {name}\n'),
+    ('vars/main.yml', '---\n# Variables for {name}\n'),
+    ('defaults/main.yml', '---\n# Default variables for {name}\n'),
+    ('meta/main.yml', '---\n# Role dependencies\n# dependencies:\n#   - role: geerlingguy.nginx\n')
+)
+
 def create_role(role_name, base_path=".", dry_run=False, verbose=False):
     """Create a new Ansible role with standard structure"""
     role_path = Path(base_path) / role_name
@@ -36,24 +45,17 @@ def create_role(role_name, base_path=".", dry_run=False, verbose=False):
     role_path.mkdir(exist_ok=True)
     
     # Create standard subdirectories
-    subdirs = ['tasks', 'handlers', 'templates', 'files', 'vars', 'defaults', 'meta']
-    for subdir in subdirs:
+    for subdir in _ROLE_SUBDIRS:
         (role_path / subdir).mkdir(exist_ok=True)
     
     # Create main.yml files
-    main_files = {
-        'tasks/main.yml': '---\n# Main tasks for {{ role_name }}\n',
-        'handlers/main.yml': '---\n# Handlers for {{ role_name }}\n',
-        'vars/main.yml': '---\n# Variables for {{ role_name }}\n',
-        'defaults/main.yml': '---\n# Default variables for {{ role_name }}\n',
-        'meta/main.yml': '---\n# Role dependencies\n# dependencies:\n#   - role: geerlingguy.nginx\n'
-    }
-    
-    for file_path, content in main_files.items():
-        full_path = role_path / file_path
-        if not full_path.exists():
-            with open(full_path, 'w') as f:
-                f.write(content.replace('{{ role_name }}', role_name))
+    for file_path, template in _ROLE_TEMPLATES:
+        # Exclusive create: one open() both checks for and writes new files
+        try:
+            with open(role_path / file_path, 'x') as f:
+                f.write(template.format(name=role_name))
+        except FileExistsError:
+            pass
     
     print(f"Created role: {role_path}")
     return True
@@ -65,6 +67,9 @@ def create_collection(collection_name, base_path=".", dry_run=False):
         print(f"  Command: ansible-galaxy collection init {collection_name}")
         return True
     
+    # Only this action spawns processes; keep subprocess off the role startup path
+    import subprocess
+    
     try:
         result = subprocess.run(
             ['ansible-galaxy', 'collection', 'init', collection_name],
@@ -80,12 +85,25 @@ def create_collection(collection_name, base_path=".", dry_run=False):
         print(f"✗ Failed to create collection: {e.stderr}")
         return False
 
+def create_collections(collection_names, base_path=".", dry_run=False):
+    """Create several collections, running up to one ansible-galaxy init per CPU at once"""
+    if dry_run or len(collection_names) == 1:
+        return all([create_collection(name, base_path, dry_run) for name in collection_names])
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    # Each init is mostly ansible-galaxy interpreter start-up, so overlap them
+    with ThreadPoolExecutor(max_workers=min(len(collection_names), os.cpu_count() or 1)) as executor:
+        results = list(executor.map(lambda name: create_collection(name, base_path), collection_names))
+    
+    return all(results)
+
 if __name__ == "__main__":
     import argparse
     
     parser = argparse.ArgumentParser(description='Manage Ansible roles and collections')
     parser.add_argument('action', choices=['role', 'collection'], help='Action to perform')
-    parser.add_argument('name', help='Role or collection name')
+    parser.add_argument('name', help='Role or collection name (comma-separated for several collections)')
     parser.add_argument('path', nargs='?', default='.', help='Base path (default: current directory)')
     parser.add_argument('--dry-run', action='store_true', help='Show what would be done')
     parser.add_argument('--verbose', action='store_true', help='Show detailed planning information')
@@ -96,6 +114,6 @@ if __name__ == "__main__":
     if args.action == "role":
         success = create_role(args.name, args.path, args.dry_run, args.verbose)
     elif args.action == "collection":
-        success = create_collection(args.name, args.path, args.dry_run)
+        success = create_collections(args.name.split(','), args.path, args.dry_run)
     
     sys.exit(0 if success else 1)
\ No newline at end of file
@@ -5,119 +5,476 @@ Enhanced state comparison and multi-node consistency validation
 """
 
 import argparse
+import asyncio
 import json
 import subprocess
 import sys
 import hashlib
 import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import repeat
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 
+# Prefer orjson for snapshot and report files: it parses bytes and emits
+# bytes directly, skipping the UTF-8 decode/encode round trip
+try:
+    import orjson
+    
+    def _dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    
+    def _dumps_canonical(obj):
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj):
+        return json.dumps(obj, indent=2).encode()
+    
+    def _dumps_canonical(obj):
+        return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode()
+    
+    _loads = json.loads
+
+# Report fields that differ on every run even when the results are the same
+_RUN_SPECIFIC_REPORT_FIELDS = ("pre_snapshot", "post_snapshot", "timestamp")
+
+def _canonical(obj: Any) -> Any:
+    """obj with every list sorted, so the same results encode the same whatever order they were found in"""
+    if isinstance(obj, dict):
+        return {key: _canonical(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return sorted((_canonical(value) for value in obj), key=_dumps_canonical)
+    return obj
+
+def _report_results(report: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """The run-independent part of a report in canonical form, and its digest"""
+    results = _canonical({k: v for k, v in report.items() if k not in _RUN_SPECIFIC_REPORT_FIELDS})
+    return results, hashlib.blake2b(_dumps_canonical(results), digest_size=8).hexdigest()
+
+# find module arguments for config hashing: the module checksums each file
+# on the host and returns one JSON result, with no per-file process or text parsing
+_CONFIG_FIND_ARGS = "paths=/etc patterns=*.conf file_type=file recurse=yes hidden=yes get_checksum=yes"
+
+# Lines of a failed capture's stderr shown with its failure message
+_STDERR_TAIL_LINES = 5
+
+async def _run_concurrently(commands) -> List[Tuple[int, bytes]]:
+    """Run commands side by side with stdout discarded, returning their exit codes and stderr"""
+    processes = []
+    try:
+        for cmd in commands:
+            processes.append(await asyncio.create_subprocess_exec(
+                *cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            ))
+    except OSError:
+        # Leave nothing running when one of the commands cannot start
+        for process in processes:
+            process.kill()
+            await process.wait()
+        raise
+    
+    outputs = await asyncio.gather(*(process.communicate() for process in processes))
+    return [(process.returncode, stderr) for process, (_, stderr) in zip(processes, outputs)]
+
+def _print_capture_error(what: str, returncode: int, cmd: List[str], stderr: bytes) -> None:
+    """Report a failed capture with the last lines ansible wrote to stderr"""
+    e = subprocess.CalledProcessError(returncode, cmd, stderr=stderr)
+    print(f"  ✗ Failed to capture {what}: {e}")
+    for line in stderr.decode(errors="replace").splitlines()[-_STDERR_TAIL_LINES:]:
+        print(f"      {line}")
+
+def _write_atomic(path: Path, payload: bytes) -> None:
+    """Write payload to path via a temp file, so readers never see a partial file"""
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    """Hard-link target to source, copying where the filesystem has no hard links"""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+def _unchanged_hosts(playbook_output: str) -> List[str]:
+    """Hosts the json stdout callback reports as run cleanly with nothing changed"""
+    try:
+        stats = _loads(playbook_output)["stats"]
+    except (ValueError, KeyError, TypeError):
+        return []
+    return [
+        host for host, tally in stats.items()
+        if not tally.get("changed") and not tally.get("failures") and not tally.get("unreachable")
+    ]
+
+def _tree_files(tree_dir: Path):
+    """Per-host result files in an ansible --tree dir, which is absent when no host ran"""
+    return tree_dir.iterdir() if tree_dir.is_dir() else iter(())
+
+def _load_file(path: Path) -> Any:
+    """Parsed JSON content of a snapshot file"""
+    return _loads(path.read_bytes())
+
+def _cache_view(data: Any) -> Any:
+    """The part of a parsed snapshot file that is read again: the key facts, or the whole file"""
+    if isinstance(data, dict) and isinstance(data.get('ansible_facts'), dict):
+        facts = data['ansible_facts']
+        return {'ansible_facts': {field: facts[field] for field in _CACHED_FACT_FIELDS if field in facts}}
+    return data
+
+class SnapshotCache:
+    """Parsed snapshot files, kept so a comparison and a consistency check share one parse"""
+    
+    def __init__(self):
+        self._parsed = {}
+    
+    def load(self, path: Path) -> Any:
+        """Cached view of path, read from disk only on first use"""
+        try:
+            return self._parsed[path]
+        except KeyError:
+            data = self._parsed[path] = _cache_view(_load_file(path))
+            return data
+    
+    def store(self, path: Path, data: Any) -> None:
+        """Keep a view of path parsed elsewhere, e.g. in a worker process"""
+        self._parsed[path] = data
+
+# Facts compared per host between snapshots
+_COMPARED_FACT_FIELDS = (
+    'ansible_distribution', 'ansible_kernel',
+    'ansible_memtotal_mb', 'ansible_processor_cores'
+)
+
+# Facts that should match on every host in the inventory
+_CONSISTENCY_FACT_FIELDS = (
+    'ansible_distribution', 'ansible_distribution_version',
+    'ansible_kernel', 'ansible_python_version'
+)
+
+# Below this many hosts a process pool costs more to start than it saves
+_PARALLEL_MIN_HOSTS = 32
+
+# Facts kept in a SnapshotCache: everything the comparison and consistency check read
+_CACHED_FACT_FIELDS = frozenset(_COMPARED_FACT_FIELDS + _CONSISTENCY_FACT_FIELDS)
+
+def _diff_host_facts(host: str, before_file: Path, after_file: Path,
+                     load_after=_load_file) -> List[Dict[str, Any]]:
+    """Key fact changes for one host between snapshots"""
+    changes = []
+    try:
+        before_facts = _loads(before_file.read_bytes()).get('ansible_facts', {})
+        after_facts = load_after(after_file).get('ansible_facts', {})
+        
+        # Compare key facts, in a fixed order so reports are stable
+        for field in _COMPARED_FACT_FIELDS:
+            if field in before_facts and field in after_facts:
+                before_val = before_facts[field]
+                after_val = after_facts[field]
+                
+                if before_val != after_val:
+                    changes.append({
+                        "host": host,
+                        "field": field,
+                        "before": before_val,
+                        "after": after_val
+                    })
+    except (json.JSONDecodeError, KeyError) as e:
+        changes.append({
+            "host": host,
+            "error": f"Failed to parse facts: {e}"
+        })
+    return changes
+
+def _diff_host_configs(host: str, before_file: Path, after_file: Path,
+                       load_after=_load_file) -> List[Dict[str, Any]]:
+    """Configuration file hash changes for one host between snapshots"""
+    changes = []
+    # Both snapshots linked to the same stored hash list: nothing to parse or compare
+    if os.path.samefile(before_file, after_file):
+        return changes
+    try:
+        before_configs = _loads(before_file.read_bytes())
+        after_configs = load_after(after_file)
+        
+        # Create hash lookup
+        before_hashes = {c['file']: c['hash'] for c in before_configs}
+        after_hashes = {c['file']: c['hash'] for c in after_configs}
+        
+        # Files whose (file, hash) pair is on one side only, found with
+        # one set operation instead of comparing every file in Python
+        changed_files = {file_path for file_path, _ in before_hashes.items() ^ after_hashes.items()}
+        
+        for file_path in changed_files:
+            before_hash = before_hashes.get(file_path)
+            after_hash = after_hashes.get(file_path)
+            
+            if before_hash is None:
+                change_type = "added"
+            elif after_hash is None:
+                change_type = "removed"
+            else:
+                change_type = "modified"
+            
+            changes.append({
+                "host": host,
+                "file": file_path,
+                "type": change_type,
+                "before_hash": before_hash,
+                "after_hash": after_hash
+            })
+    except (json.JSONDecodeError, KeyError) as e:
+        changes.append({
+            "host": host,
+            "error": f"Failed to parse configs: {e}"
+        })
+    return changes
+
+def _diff_host_services(host: str, before_file: Path, after_file: Path,
+                        load_after=_load_file) -> List[Dict[str, Any]]:
+    """Started and stopped services for one host between snapshots"""
+    changes = []
+    try:
+        before_services = set(_loads(before_file.read_bytes()))
+        after_services = set(load_after(after_file))
+        
+        # Find service changes
+        added_services = after_services - before_services
+        removed_services = before_services - after_services
+        
+        for service in added_services:
+            changes.append({
+                "host": host,
+                "service": service,
+                "type": "started"
+            })
+        
+        for service in removed_services:
+            changes.append({
+                "host": host,
+                "service": service,
+                "type": "stopped"
+            })
+            
+    except (json.JSONDecodeError, KeyError) as e:
+        changes.append({
+            "host": host,
+            "error": f"Failed to parse services: {e}"
+        })
+    return changes
+
+# Snapshot categories: subdirectory, per-host file suffix, host diff function
+# and the name used when the subdirectory is missing
+_SNAPSHOT_CATEGORIES = (
+    ("facts", "", _diff_host_facts, "fact"),
+    ("configs", "_configs", _diff_host_configs, "config"),
+    ("services", "_services", _diff_host_services, "service")
+)
+
+def _diff_host(host: str, before_root: Path, after_root: Path, kinds,
+               cache: Optional[SnapshotCache] = None,
+               collect: bool = False) -> Tuple[Any, ...]:
+    """One host's changes in each snapshot category, with its files for every category read together
+    
+    The last item maps after files to their cache views; it is only filled
+    when collect is set, so a worker process can hand them back to the parent.
+    """
+    results = []
+    views = {}
+    
+    def collect_view(path: Path) -> Any:
+        view = views[path] = _cache_view(_load_file(path))
+        return view
+    
+    for kind, suffix, diff_host, _ in _SNAPSHOT_CATEGORIES:
+        changes = []
+        after_file = after_root / kind / f"{host}{suffix}.json"
+        if kind in kinds and after_file.exists():
+            # Config hashes are never read again, so they stay out of the cache
+            load_after = _load_file
+            if kind != "configs":
+                if cache is not None:
+                    load_after = cache.load
+                elif collect:
+                    load_after = collect_view
+            changes = diff_host(host, before_root / kind / f"{host}{suffix}.json", after_file, load_after)
+        results.append(changes)
+    results.append(views)
+    return tuple(results)
+
+def _diff_hosts(before_root: Path, after_root: Path, kinds,
+                cache: Optional[SnapshotCache] = None) -> List[Tuple[Any, ...]]:
+    """_diff_host for every host with a file in before_root, limited to the given categories"""
+    host_kinds = {}
+    for kind, suffix, _, _ in _SNAPSHOT_CATEGORIES:
+        if kind in kinds:
+            for before_file in (before_root / kind).glob(f"*{suffix}.json"):
+                host = before_file.stem.replace(suffix, "") if suffix else before_file.stem
+                host_kinds.setdefault(host, set()).add(kind)
+    
+    # Hosts are independent; large inventories are parsed and diffed on every core
+    workers = os.cpu_count() or 1
+    if workers < 2 or len(host_kinds) < _PARALLEL_MIN_HOSTS:
+        return [_diff_host(host, before_root, after_root, host_kind, cache)
+                for host, host_kind in host_kinds.items()]
+    # Workers cannot fill this process's cache, so they send back the
+    # (small) views of what they parsed and the parent stores them
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        per_host = list(executor.map(_diff_host, host_kinds, repeat(before_root), repeat(after_root),
+                                     host_kinds.values(), repeat(None), repeat(cache is not None),
+                                     chunksize=8))
+    if cache is not None:
+        for host_changes in per_host:
+            for path, view in host_changes[-1].items():
+                cache.store(path, view)
+    return per_host
+
 class StateReconciliationTester:
     def __init__(self, inventory: str, output_dir: str = "/tmp/state_reconciliation"):
         self.inventory = inventory
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(exist_ok=True)
         
-    def capture_state_snapshot(self, snapshot_name: str) -> str:
-        """Capture comprehensive state snapshot"""
+    def capture_state_snapshot(self, snapshot_name: str, reuse_from: Optional[str] = None,
+                               reuse_hosts: List[str] = ()) -> str:
+        """Capture comprehensive state snapshot, taking reuse_hosts' state from the reuse_from snapshot"""
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         snapshot_dir = self.output_dir / f"{snapshot_name}_{timestamp}"
         snapshot_dir.mkdir(exist_ok=True)
         
         print(f"📸 Capturing state snapshot: {snapshot_name}")
         
-        # Capture system facts
-        facts_dir = snapshot_dir / "facts"
-        facts_dir.mkdir(exist_ok=True)
-        try:
-            subprocess.run([
-                "ansible", "all", "-i", self.inventory, "-m", "setup", 
-                "--tree", str(facts_dir)
-            ], check=True, capture_output=True)
-            print(f"  ✓ System facts captured")
-        except subprocess.CalledProcessError as e:
-            print(f"  ✗ Failed to capture facts: {e}")
+        if not reuse_from:
+            reuse_hosts = ()
+        
+        with tempfile.TemporaryDirectory(dir=snapshot_dir) as tree_root:
+            trees = {kind: Path(tree_root) / kind for kind in ("facts", "configs", "services")}
+            commands = {
+                "facts": ["ansible", "all", "-i", self.inventory, "-m", "setup"],
+                "configs": ["ansible", "all", "-i", self.inventory, "-m", "find",
+                            "-a", _CONFIG_FIND_ARGS],
+                "services": ["ansible", "all", "-i", self.inventory, "-m", "shell",
+                             "-a", "systemctl list-units --type=service --state=running --no-pager"]
+            }
+            for kind, cmd in commands.items():
+                cmd.extend(["--tree", str(trees[kind])])
+            if reuse_hosts:
+                # Exclusions go in a file, one pattern per line: a ':'-joined pattern
+                # breaks IPv6 hosts and one huge argument fails with E2BIG
+                limit_file = Path(tree_root) / "limit"
+                limit_file.write_text("\n".join(["all", *(f"!{host}" for host in reuse_hosts)]) + "\n")
+                for cmd in commands.values():
+                    cmd.extend(["--limit", f"@{limit_file}"])
             
-        # Capture configuration file hashes
-        configs_dir = snapshot_dir / "configs"
-        configs_dir.mkdir(exist_ok=True)
-        try:
-            result = subprocess.run([
-                "ansible", "all", "-i", self.inventory, "-m", "shell",
-                "-a", "find /etc -name '*.conf' -type f -exec md5sum {} \\; 2>/dev/null || true"
-            ], capture_output=True, text=True, check=True)
+            # The three captures are independent, so they run side by side;
+            # results land in the --tree dirs and only stderr is kept, for errors
+            try:
+                results = dict(zip(commands, asyncio.run(_run_concurrently(commands.values()))))
+            except OSError as e:
+                if not reuse_hosts:
+                    raise
+                print(f"  ⚠️  Limited capture could not start ({e}); capturing every host")
+                reuse_hosts = ()
+                for kind, cmd in commands.items():
+                    del cmd[-2:]
+                    shutil.rmtree(trees[kind], ignore_errors=True)
+                results = dict(zip(commands, asyncio.run(_run_concurrently(commands.values()))))
             
-            # Save config hashes per host
-            self._save_config_hashes(result.stdout, configs_dir)
-            print(f"  ✓ Configuration hashes captured")
-        except subprocess.CalledProcessError as e:
-            print(f"  ✗ Failed to capture configs: {e}")
+            # Capture system facts
+            facts_dir = snapshot_dir / "facts"
+            facts_dir.mkdir(exist_ok=True)
+            # --tree names files after the bare host; comparisons read <host>.json.
+            # A non-zero exit (e.g. one unreachable host) still leaves the other
+            # hosts' results in the tree, so they are kept either way; failed
+            # hosts' results carry no facts and are dropped without a parse
+            for result_file in _tree_files(trees["facts"]):
+                if b'"ansible_facts"' in result_file.read_bytes():
+                    os.replace(result_file, facts_dir / f"{result_file.name}.json")
+            returncode, stderr = results["facts"]
+            if returncode == 0:
+                print(f"  ✓ System facts captured")
+            else:
+                _print_capture_error("facts", returncode, commands["facts"], stderr)
             
-        # Capture running services
-        services_dir = snapshot_dir / "services"
-        services_dir.mkdir(exist_ok=True)
-        try:
-            result = subprocess.run([
-                "ansible", "all", "-i", self.inventory, "-m", "shell",
-                "-a", "systemctl list-units --type=service --state=running --no-pager"
-            ], capture_output=True, text=True, check=True)
+            # Capture configuration file hashes
+            configs_dir = snapshot_dir / "configs"
+            configs_dir.mkdir(exist_ok=True)
+            # Save config hashes per host; failed hosts are skipped there
+            self._save_config_hashes(trees["configs"], configs_dir)
+            returncode, stderr = results["configs"]
+            if returncode == 0:
+                print(f"  ✓ Configuration hashes captured")
+            else:
+                _print_capture_error("configs", returncode, commands["configs"], stderr)
             
-            # Save service status per host
-            self._save_service_status(result.stdout, services_dir)
-            print(f"  ✓ Service status captured")
-        except subprocess.CalledProcessError as e:
-            print(f"  ✗ Failed to capture services: {e}")
+            # Capture running services
+            services_dir = snapshot_dir / "services"
+            services_dir.mkdir(exist_ok=True)
+            # Save service status per host; failed hosts are skipped there
+            self._save_service_status(trees["services"], services_dir)
+            returncode, stderr = results["services"]
+            if returncode == 0:
+                print(f"  ✓ Service status captured")
+            else:
+                _print_capture_error("services", returncode, commands["services"], stderr)
             
+        if reuse_hosts:
+            # Hosts left out of the runs above keep their earlier state files
+            for kind, suffix in (("facts", ""), ("configs", "_configs"), ("services", "_services")):
+                for host in reuse_hosts:
+                    source = Path(reuse_from) / kind / f"{host}{suffix}.json"
+                    if source.exists():
+                        _link_or_copy(source, snapshot_dir / kind / f"{host}{suffix}.json")
+            print(f"  ♻️  Reused state of {len(reuse_hosts)} unchanged hosts")
+        
         return str(snapshot_dir)
     
-    def _save_config_hashes(self, hash_output: str, configs_dir: Path):
-        """Parse and save configuration file hashes"""
-        current_host = None
-        host_hashes = {}
-        
-        for line in hash_output.split('\n'):
-            if line.strip():
-                # Ansible output format: hostname | SUCCESS | rc=0 >>
-                if ' | SUCCESS | ' in line:
-                    current_host = line.split(' | ')[0]
-                    host_hashes[current_host] = []
-                elif current_host and line.strip():
-                    # Parse md5sum output: hash  filename
-                    parts = line.strip().split('  ', 1)
-                    if len(parts) == 2:
-                        host_hashes[current_host].append({
-                            'hash': parts[0],
-                            'file': parts[1]
-                        })
-        
-        # Save per host
-        for host, hashes in host_hashes.items():
-            (configs_dir / f"{host}_configs.json").write_text(json.dumps(hashes, indent=2))
+    def _tree_results(self, tree_dir: Path):
+        """Yield (host, result) for each successful host result written by ansible --tree"""
+        for result_file in _tree_files(tree_dir):
+            try:
+                result = _loads(result_file.read_bytes())
+            except json.JSONDecodeError:
+                continue
+            if not result.get('failed') and not result.get('unreachable'):
+                yield result_file.name, result
+    
+    def _save_config_hashes(self, tree_dir: Path, configs_dir: Path):
+        """Save configuration file hashes from per-host find module results"""
+        # Hosts with identical configs share one stored file across all snapshots
+        objects_dir = self.output_dir / "objects"
+        objects_dir.mkdir(exist_ok=True)
+        for host, result in self._tree_results(tree_dir):
+            # Unreadable files come back without a checksum; skip them as md5sum did
+            hashes = sorted((
+                {'hash': entry['checksum'], 'file': entry['path']}
+                for entry in result.get('files', []) if 'checksum' in entry
+            ), key=lambda c: c['file'])
+            payload = _dumps(hashes)
+            object_path = objects_dir / hashlib.blake2b(payload, digest_size=16).hexdigest()
+            if not object_path.exists():
+                _write_atomic(object_path, payload)
+            
+            _link_or_copy(object_path, configs_dir / f"{host}_configs.json")
     
-    def _save_service_status(self, service_output: str, services_dir: Path):
-        """Parse and save service status"""
-        current_host = None
-        host_services = {}
-        
-        for line in service_output.split('\n'):
-            if line.strip():
-                if ' | SUCCESS | ' in line:
-                    current_host = line.split(' | ')[0]
-                    host_services[current_host] = []
-                elif current_host and line.strip():
-                    # Parse service line: service.service   loaded active running   description
-                    if '.service' in line and 'running' in line:
-                        service_name = line.split()[0]
-                        host_services[current_host].append(service_name)
-        
-        # Save per host
-        for host, services in host_services.items():
-            (services_dir / f"{host}_services.json").write_text(json.dumps(services, indent=2))
+    def _save_service_status(self, tree_dir: Path, services_dir: Path):
+        """Save running services from per-host systemctl results"""
+        for host, result in self._tree_results(tree_dir):
+            # Service line: service.service   loaded active running   description
+            services = [
+                line.split()[0] for line in result.get('stdout_lines', [])
+                if '.service' in line and 'running' in line
+            ]
+            (services_dir / f"{host}_services.json").write_bytes(_dumps(services))
     
-    def compare_snapshots(self, before_dir: str, after_dir: str) -> Dict[str, Any]:
-        """Compare two state snapshots"""
+    def compare_snapshots(self, before_dir: str, after_dir: str,
+                          cache: Optional[SnapshotCache] = None) -> Dict[str, Any]:
+        """Compare two state snapshots, keeping after_dir facts and services in cache if given"""
         print(f"🔍 Comparing snapshots: {Path(before_dir).name} vs {Path(after_dir).name}")
         
         differences = {
@@ -127,186 +484,34 @@ class StateReconciliationTester:
             "summary": {"total_changes": 0}
         }
         
-        # Compare facts
-        facts_diff = self._compare_facts(
-            Path(before_dir) / "facts", 
-            Path(after_dir) / "facts"
-        )
-        differences["facts"] = facts_diff
+        before_root = Path(before_dir)
+        after_root = Path(after_dir)
         
-        # Compare configurations
-        configs_diff = self._compare_configs(
-            Path(before_dir) / "configs", 
-            Path(after_dir) / "configs"
-        )
-        differences["configs"] = configs_diff
+        # Categories missing from either snapshot are reported rather than compared
+        kinds = []
+        for kind, _, _, label in _SNAPSHOT_CATEGORIES:
+            if (before_root / kind).exists() and (after_root / kind).exists():
+                kinds.append(kind)
+            else:
+                differences[kind] = {"changes": [], "error": f"Missing {label} directories"}
         
-        # Compare services
-        services_diff = self._compare_services(
-            Path(before_dir) / "services", 
-            Path(after_dir) / "services"
-        )
-        differences["services"] = services_diff
+        # One pass over the hosts compares all categories for each host
+        per_host = _diff_hosts(before_root, after_root, kinds, cache)
+        for index, (kind, _, _, _) in enumerate(_SNAPSHOT_CATEGORIES):
+            if kind in kinds:
+                differences[kind] = {"changes": [change for host_changes in per_host for change in host_changes[index]]}
         
         # Calculate summary
-        total_changes = (
-            len(facts_diff.get("changes", [])) +
-            len(configs_diff.get("changes", [])) +
-            len(services_diff.get("changes", []))
+        differences["summary"]["total_changes"] = sum(
+            len(differences[kind].get("changes", [])) for kind, _, _, _ in _SNAPSHOT_CATEGORIES
         )
-        differences["summary"]["total_changes"] = total_changes
         
         return differences
     
-    def _compare_facts(self, before_dir: Path, after_dir: Path) -> Dict[str, Any]:
-        """Compare system facts between snapshots"""
-        changes = []
-        
-        if not before_dir.exists() or not after_dir.exists():
-            return {"changes": changes, "error": "Missing fact directories"}
-        
-        # Get all fact files
-        before_files = list(before_dir.glob("*.json"))
-        after_files = list(after_dir.glob("*.json"))
-        
-        for before_file in before_files:
-            host = before_file.stem
-            after_file = after_dir / f"{host}.json"
-            
-            if after_file.exists():
-                try:
-                    before_facts = json.loads(before_file.read_text())
-                    after_facts = json.loads(after_file.read_text())
-                    
-                    # Compare key facts
-                    key_fields = [
-                        'ansible_distribution', 'ansible_kernel', 
-                        'ansible_memtotal_mb', 'ansible_processor_cores'
-                    ]
-                    
-                    for field in key_fields:
-                        if field in before_facts.get('ansible_facts', {}) and \
-                           field in after_facts.get('ansible_facts', {}):
-                            before_val = before_facts['ansible_facts'][field]
-                            after_val = after_facts['ansible_facts'][field]
-                            
-                            if before_val != after_val:
-                                changes.append({
-                                    "host": host,
-                                    "field": field,
-                                    "before": before_val,
-                                    "after": after_val
-                                })
-                except (json.JSONDecodeError, KeyError) as e:
-                    changes.append({
-                        "host": host,
-                        "error": f"Failed to parse facts: {e}"
-                    })
-        
-        return {"changes": changes}
-    
-    def _compare_configs(self, before_dir: Path, after_dir: Path) -> Dict[str, Any]:
-        """Compare configuration file hashes"""
-        changes = []
-        
-        if not before_dir.exists() or not after_dir.exists():
-            return {"changes": changes, "error": "Missing config directories"}
-        
-        # Get all config files
-        before_files = list(before_dir.glob("*_configs.json"))
-        after_files = list(after_dir.glob("*_configs.json"))
-        
-        for before_file in before_files:
-            host = before_file.stem.replace("_configs", "")
-            after_file = after_dir / f"{host}_configs.json"
-            
-            if after_file.exists():
-                try:
-                    before_configs = json.loads(before_file.read_text())
-                    after_configs = json.loads(after_file.read_text())
-                    
-                    # Create hash lookup
-                    before_hashes = {c['file']: c['hash'] for c in before_configs}
-                    after_hashes = {c['file']: c['hash'] for c in after_configs}
-                    
-                    # Find changed files
-                    all_files = set(before_hashes.keys()) | set(after_hashes.keys())
-                    
-                    for file_path in all_files:
-                        before_hash = before_hashes.get(file_path)
-                        after_hash = after_hashes.get(file_path)
-                        
-                        if before_hash != after_hash:
-                            if before_hash is None:
-                                change_type = "added"
-                            elif after_hash is None:
-                                change_type = "removed"
-                            else:
-                                change_type = "modified"
-                            
-                            changes.append({
-                                "host": host,
-                                "file": file_path,
-                                "type": change_type,
-                                "before_hash": before_hash,
-                                "after_hash": after_hash
-                            })
-                except (json.JSONDecodeError, KeyError) as e:
-                    changes.append({
-                        "host": host,
-                        "error": f"Failed to parse configs: {e}"
-                    })
-        
-        return {"changes": changes}
-    
-    def _compare_services(self, before_dir: Path, after_dir: Path) -> Dict[str, Any]:
-        """Compare running services"""
-        changes = []
-        
-        if not before_dir.exists() or not after_dir.exists():
-            return {"changes": changes, "error": "Missing service directories"}
-        
-        # Get all service files
-        before_files = list(before_dir.glob("*_services.json"))
-        after_files = list(after_dir.glob("*_services.json"))
-        
-        for before_file in before_files:
-            host = before_file.stem.replace("_services", "")
-            after_file = after_dir / f"{host}_services.json"
-            
-            if after_file.exists():
-                try:
-                    before_services = set(json.loads(before_file.read_text()))
-                    after_services = set(json.loads(after_file.read_text()))
-                    
-                    # Find service changes
-                    added_services = after_services - before_services
-                    removed_services = before_services - after_services
-                    
-                    for service in added_services:
-                        changes.append({
-                            "host": host,
-                            "service": service,
-                            "type": "started"
-                        })
-                    
-                    for service in removed_services:
-                        changes.append({
-                            "host": host,
-                            "service": service,
-                            "type": "stopped"
-                        })
-                        
-                except (json.JSONDecodeError, KeyError) as e:
-                    changes.append({
-                        "host": host,
-                        "error": f"Failed to parse services: {e}"
-                    })
-        
-        return {"changes": changes}
-    
-    def check_multi_node_consistency(self, snapshot_dir: str) -> Dict[str, Any]:
+    def check_multi_node_consistency(self, snapshot_dir: str,
+                                     cache: Optional[SnapshotCache] = None) -> Dict[str, Any]:
         """Check state consistency across all nodes in inventory"""
+        load = cache.load if cache is not None else _load_file
         print(f"🔄 Checking multi-node consistency")
         
         consistency_report = {
@@ -326,7 +531,7 @@ class StateReconciliationTester:
         all_facts = {}
         for fact_file in facts_dir.glob("*.json"):
             try:
-                facts = json.loads(fact_file.read_text())
+                facts = load(fact_file)
                 all_facts[fact_file.stem] = facts.get('ansible_facts', {})
             except (json.JSONDecodeError, KeyError):
                 continue
@@ -336,19 +541,16 @@ class StateReconciliationTester:
             return consistency_report
         
         # Check for inconsistencies in key fields
-        key_fields = [
-            'ansible_distribution', 'ansible_distribution_version',
-            'ansible_kernel', 'ansible_python_version'
-        ]
-        
-        for field in key_fields:
+        for field in _CONSISTENCY_FACT_FIELDS:
+            # Fleets mostly agree: count distinct values first and only group
+            # hosts by value for fields that actually differ
+            if len({facts[field] for facts in all_facts.values() if field in facts}) < 2:
+                continue
+            
             values = {}
             for host, facts in all_facts.items():
                 if field in facts:
-                    value = facts[field]
-                    if value not in values:
-                        values[value] = []
-                    values[value].append(host)
+                    values.setdefault(facts[field], []).append(host)
             
             if len(values) > 1:
                 consistency_report["consistent"] = False
@@ -363,7 +565,7 @@ class StateReconciliationTester:
             all_services = {}
             for service_file in services_dir.glob("*_services.json"):
                 try:
-                    services = set(json.loads(service_file.read_text()))
+                    services = set(load(service_file))
                     host = service_file.stem.replace("_services", "")
                     all_services[host] = services
                 except (json.JSONDecodeError, KeyError):
@@ -371,12 +573,7 @@ class StateReconciliationTester:
             
             if len(all_services) > 1:
                 # Find services that should be consistent across all nodes
-                common_services = None
-                for host, services in all_services.items():
-                    if common_services is None:
-                        common_services = services
-                    else:
-                        common_services &= services
+                common_services = set.intersection(*all_services.values())
                 
                 # Check for missing common services
                 for host, services in all_services.items():
@@ -396,8 +593,9 @@ class StateReconciliationTester:
         
         return consistency_report
     
-    def run_reconciliation_test(self, playbook: str, extra_vars: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
-        """Run complete reconciliation test"""
+    def run_reconciliation_test(self, playbook: str, extra_vars: Optional[Dict[str, str]] = None,
+                                reuse_unchanged: bool = False) -> Dict[str, Any]:
+        """Run complete reconciliation test, optionally reusing pre-run state for hosts the playbook did not change"""
         print(f"🚀 Starting reconciliation test for: {playbook}")
         
         # Capture pre-execution state
@@ -410,8 +608,10 @@ class StateReconciliationTester:
             extra_vars_str = ",".join([f"{k}={v}" for k, v in extra_vars.items()])
             cmd.extend(["--extra-vars", extra_vars_str])
         
+        # The json callback reports per-host change counts for reuse_unchanged
+        env = {**os.environ, "ANSIBLE_STDOUT_CALLBACK": "json"} if reuse_unchanged else None
         try:
-            playbook_result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            playbook_result = subprocess.run(cmd, capture_output=True, text=True, check=True, env=env)
             playbook_success = True
             print(f"  ✓ Playbook executed successfully")
         except subprocess.CalledProcessError as e:
@@ -420,25 +620,30 @@ class StateReconciliationTester:
             playbook_result = e
         
         # Capture post-execution state
-        post_snapshot = self.capture_state_snapshot("post_execution")
+        unchanged_hosts = _unchanged_hosts(playbook_result.stdout or "") if reuse_unchanged else []
+        post_snapshot = self.capture_state_snapshot("post_execution", pre_snapshot, unchanged_hosts)
         
         # Compare snapshots
-        differences = self.compare_snapshots(pre_snapshot, post_snapshot)
+        # The consistency check reads the same post-snapshot files the comparison parses
+        post_cache = SnapshotCache()
+        differences = self.compare_snapshots(pre_snapshot, post_snapshot, post_cache)
         
         # Check multi-node consistency
-        post_consistency = self.check_multi_node_consistency(post_snapshot)
+        post_consistency = self.check_multi_node_consistency(post_snapshot, post_cache)
         
         # Generate report
+        finished = datetime.now()
         report = {
             "playbook": playbook,
             "inventory": self.inventory,
             "pre_snapshot": pre_snapshot,
             "post_snapshot": post_snapshot,
+            "reused_hosts": unchanged_hosts,
             "playbook_success": playbook_success,
             "playbook_returncode": playbook_result.returncode if hasattr(playbook_result, 'returncode') else 1,
             "state_differences": differences,
             "consistency_check": post_consistency,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": finished.isoformat(),
             "summary": {
                 "total_changes": differences["summary"]["total_changes"],
                 "consistent": post_consistency["consistent"],
@@ -446,10 +651,29 @@ class StateReconciliationTester:
             }
         }
         
-        # Save report
-        report_file = self.output_dir / f"reconciliation_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        report_file.write_text(json.dumps(report, indent=2))
-        print(f"📄 Report saved: {report_file}")
+        # Save results under a digest of their content, so a rerun with the same
+        # results reuses the existing file; lists are sorted first, as set and
+        # directory order would otherwise change the digest between runs; this run's snapshots and time go in
+        # a small per-run record, which latest.json points at
+        results, digest = _report_results(report)
+        report_file = self.output_dir / f"reconciliation_report_{digest}.json"
+        if report_file.exists():
+            print(f"📄 Same results as earlier report: {report_file}")
+        else:
+            _write_atomic(report_file, _dumps(results))
+            print(f"📄 Report saved: {report_file}")
+        
+        run_record = {field: report[field] for field in _RUN_SPECIFIC_REPORT_FIELDS}
+        run_record["summary"] = report["summary"]
+        run_record["report"] = report_file.name
+        run_file = self.output_dir / f"reconciliation_run_{finished.strftime('%Y%m%d_%H%M%S')}.json"
+        _write_atomic(run_file, _dumps(run_record))
+        print(f"📄 Run recorded: {run_file}")
+        
+        latest_tmp = self.output_dir / f"latest.json.{os.getpid()}.tmp"
+        latest_tmp.unlink(missing_ok=True)
+        os.symlink(run_file.name, latest_tmp)
+        os.replace(latest_tmp, self.output_dir / "latest.json")
         
         return report
 
@@ -462,6 +686,7 @@ Examples:
   %(prog)s -i inventory/hosts site.yml                    # Test site.yml
   %(prog)s -i inventory/hosts deploy.yml --compare-only    # Compare existing snapshots
   %(prog)s -i inventory/hosts --check-consistency snapshot_20241201_120000  # Check consistency
+  %(prog)s -i inventory/hosts site.yml --reuse-unchanged  # Re-capture only changed hosts
         """
     )
     
@@ -474,6 +699,8 @@ Examples:
     parser.add_argument("--output-dir", default="/tmp/state_reconciliation",
                        help="Output directory for snapshots and reports")
     parser.add_argument("--extra-vars", help="Extra variables (key=value format)")
+    parser.add_argument("--reuse-unchanged", action="store_true",
+                       help="Skip post-run capture for hosts the playbook reported no changes on")
     parser.add_argument("--quiet", action="store_true", help="Minimal output")
     
     args = parser.parse_args()
@@ -515,7 +742,7 @@ Examples:
             
         elif args.playbook:
             # Run full reconciliation test
-            report = tester.run_reconciliation_test(args.playbook, extra_vars)
+            report = tester.run_reconciliation_test(args.playbook, extra_vars, args.reuse_unchanged)
             
             if not args.quiet:
                 print(f"\n📊 Reconciliation Test Results:")
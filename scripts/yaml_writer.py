@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+YAML Writer
+Direct block-YAML emitter for the plain data these scripts generate
+"""
+
+import json
+import math
+import re
+
+# Strings that PyYAML reads back as the same string when written unquoted:
+# identifiers, paths and dotted quads, but never bools, nulls or numbers
+_PLAIN_SCALAR_RE = re.compile(r'~/[\w./@-]*|[A-Za-z_/][\w./@-]*|\d+(?:\.\d+){2,}')
+_YAML_KEYWORDS = frozenset(('yes', 'no', 'true', 'false', 'on', 'off', 'null'))
+
+# Characters escaped inside double quotes: YAML reads \u escapes one code
+# unit at a time, so astral characters need \U rather than JSON surrogates
+_NON_ASCII_RE = re.compile(r'[^\x00-\x7e]')
+
+def _escape(match):
+    code = ord(match.group())
+    return f"\\u{code:04x}" if code <= 0xFFFF else f"\\U{code:08x}"
+
+def yaml_scalar(value):
+    """Render a scalar as YAML, double-quoting strings only when needed"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return '.nan'
+        if math.isinf(value):
+            return '.inf' if value > 0 else '-.inf'
+        text = repr(value)
+        # YAML 1.1 floats need a dot: 1e+20 would read back as a string
+        return text.replace('e', '.0e') if '.' not in text and 'e' in text else text
+    if isinstance(value, str):
+        if _PLAIN_SCALAR_RE.fullmatch(value) and value.lower() not in _YAML_KEYWORDS:
+            return value
+        return _NON_ASCII_RE.sub(_escape, json.dumps(value, ensure_ascii=False))
+    if isinstance(value, (dict, list)) and not value:
+        return '{}' if isinstance(value, dict) else '[]'
+    raise TypeError(f"cannot write {type(value).__name__} as a YAML scalar")
+
+def _block_lines(value, indent):
+    """Yield block-YAML lines for a non-empty dict or list, PyYAML style"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            key = yaml_scalar(key)
+            if isinstance(item, (dict, list)) and item:
+                yield f"{indent}{key}:\n"
+                # Sequences under a key are not indented, as yaml.dump does
+                yield from _block_lines(item, indent + '  ' if isinstance(item, dict) else indent)
+            else:
+                yield f"{indent}{key}: {yaml_scalar(item)}\n"
+    else:
+        for item in value:
+            if isinstance(item, (dict, list)) and item:
+                lines = _block_lines(item, indent + '  ')
+                yield f"{indent}- {next(lines)[len(indent) + 2:]}"
+                yield from lines
+            else:
+                yield f"{indent}- {yaml_scalar(item)}\n"
+
+def write_yaml(data, f):
+    """Write a dict or list of plain values to f as block YAML
+
+    Raises TypeError for values with no plain YAML form (dates, sets, ...);
+    nothing has been written to f when that happens.
+    """
+    if not isinstance(data, (dict, list)) or not data:
+        f.write(f"{yaml_scalar(data)}\n")
+        return
+    f.write(''.join(_block_lines(data, '')))
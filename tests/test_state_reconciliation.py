@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Tests for state_reconciliation report digests
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / "scripts"
+
+# Compares two snapshots and prints the digest of the run-independent results
+_DIGEST_SCRIPT = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from state_reconciliation import StateReconciliationTester, _report_results
+tester = StateReconciliationTester("inventory", sys.argv[2])
+report = {
+    "state_differences": tester.compare_snapshots(sys.argv[3], sys.argv[4]),
+    "consistency_check": tester.check_multi_node_consistency(sys.argv[4]),
+}
+print(_report_results(report)[1])
+"""
+
+def _write_snapshot(root: Path, version: int):
+    """Three hosts whose configs, services and kernels differ between versions"""
+    for kind in ("facts", "configs", "services"):
+        (root / kind).mkdir(parents=True)
+    for index, host in enumerate(("web1", "web2", "db1")):
+        facts = {"ansible_facts": {"ansible_kernel": f"5.{version}.{index}",
+                                   "ansible_distribution": "Debian"}}
+        configs = [{"file": f"/etc/app{n}.conf", "hash": f"{n}-{version}"} for n in range(20)]
+        services = [f"svc{n}.service" for n in range(version * 10, version * 10 + 20)]
+        (root / "facts" / f"{host}.json").write_text(json.dumps(facts))
+        (root / "configs" / f"{host}_configs.json").write_text(json.dumps(configs))
+        (root / "services" / f"{host}_services.json").write_text(json.dumps(services))
+
+class ReportDigestTest(unittest.TestCase):
+    def test_digest_is_independent_of_hash_seed(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            before, after = Path(tmp) / "before", Path(tmp) / "after"
+            _write_snapshot(before, 1)
+            _write_snapshot(after, 2)
+            
+            digests = set()
+            for seed in ("1", "2"):
+                result = subprocess.run(
+                    [sys.executable, "-c", _DIGEST_SCRIPT, str(SCRIPTS_DIR),
+                     str(Path(tmp) / "out"), str(before), str(after)],
+                    capture_output=True, text=True, check=True,
+                    env={**os.environ, "PYTHONHASHSEED": seed}
+                )
+                digests.add(result.stdout.splitlines()[-1])
+            
+            self.assertEqual(len(digests), 1, digests)
+
+if __name__ == "__main__":
+    unittest.main()